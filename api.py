@@ -0,0 +1,246 @@
+# Headless HTTP/JSON recommendation API
+"""
+HTTP API for Netflix recommendation chatbot
+Exposes the recommendation engine without Streamlit for service-to-service use
+
+Run with:
+    python api.py
+or
+    API_WORKERS=4 uvicorn api:app --workers 4
+"""
+import hashlib
+import os
+import threading
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response
+from config import *
+from data_processor import DataProcessor
+from indexing import max_pool_results, query_size
+from llm_scheduler import DeadlineExceededError, PRIORITY_INTERACTIVE
+from recommendation_engine import RecommendationEngine
+from recommendation_store import get_recommendation_store
+
+
+app = FastAPI(title=PAGE_TITLE)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def open_database():
+    """Open the existing ChromaDB database built by the Streamlit app"""
+    if not os.path.isdir(DB_PATH):
+        raise RuntimeError(f"Database not found at {DB_PATH}. Build it first by running the app.")
+    data_processor = DataProcessor()
+    if not data_processor.initialize_chromadb():
+        raise RuntimeError(f"Could not open the database at {DB_PATH}")
+    return data_processor
+
+
+def get_engine():
+    """Return this worker's recommendation engine, creating it on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            data_processor = open_database()
+            engine = RecommendationEngine(
+                data_processor.get_collection(),
+                embedding_model=data_processor.load_query_embedding_model(),
+                # Every server worker shares the key's quota
+                processes=API_WORKERS
+            )
+            if PRECOMPUTE_ENABLED:
+                engine.attach_store(get_recommendation_store(engine.layout))
+            _engine = engine
+        return _engine
+
+
+def build_where(category=None, language=None):
+    """Build a ChromaDB metadata filter from optional query parameters"""
+    filters = []
+    if category:
+        filters.append({"category": category})
+    if language:
+        filters.append({"original_language": language})
+    if not filters:
+        return None
+    return filters[0] if len(filters) == 1 else {"$and": filters}
+
+
+def format_item(doc_id, document, metadata, distance=None):
+    """Shape a ChromaDB record as a JSON item.
+
+    id is the catalog's own id column, used by the /title and /similar paths;
+    doc_id is the internal ChromaDB row key.
+    """
+    # ChromaDB does not keep metadata key order, so sort it for stable bodies and ETags
+    item = {key: value for key, value in sorted((metadata or {}).items())}
+    item["doc_id"] = doc_id
+    item["overview"] = document
+    if distance is not None:
+        item["distance"] = distance
+    return item
+
+
+def format_results(results, exclude_id=None):
+    """Flatten a ChromaDB query result into a list of items"""
+    distances = results.get("distances") or [[None] * len(results["ids"][0])]
+    items = [
+        format_item(doc_id, document, metadata, distance)
+        for doc_id, document, metadata, distance in zip(
+            results["ids"][0], results["documents"][0], results["metadatas"][0], distances[0]
+        )
+    ]
+    return [item for item in items if exclude_id is None or item.get("id") != exclude_id]
+
+
+def get_title_record(collection, content_id, include=None):
+    """Fetch a title's stored record by catalog id, whether indexed as one vector or several"""
+    include = include or ["documents", "metadatas"]
+    # Every vector of a title carries its metadata, so any one will do
+    record = collection.get(where={"id": content_id}, limit=1, include=include)
+    return record if record["ids"] else None
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def title_query_embedding(collection, content_id):
+    """Embedding that represents a title for similarity search, or None if unknown.
+
+    Multi-vector layouts store several vectors per title. Only the overview
+    vectors are used when present, so a title vector does not turn "similar"
+    into "similarly named"; chunks are averaged into one unit vector.
+    """
+    record = collection.get(where={"id": content_id}, include=["embeddings", "metadatas"])
+    if not record["ids"]:
+        return None
+    vectors = np.asarray(record["embeddings"], dtype=np.float32)
+    overview = [i for i, metadata in enumerate(record["metadatas"]) if (metadata or {}).get("field") == "overview"]
+    if overview:
+        vectors = vectors[overview]
+    mean = vectors.mean(axis=0)
+    norm = np.linalg.norm(mean)
+    return (mean / norm if norm else mean).tolist()
+
+
+@app.middleware("http")
+async def add_etag(request: Request, call_next):
+    """Tag GET responses with a content ETag and answer If-None-Match with 304.
+
+    The ETag is computed before GZipMiddleware compresses the body, so the
+    gzip and identity encodings share it and it must be weak (RFC 9110 8.8.1).
+    """
+    response = await call_next(request)
+    if request.method != "GET" or response.status_code != 200:
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    etag = 'W/"{}"'.format(hashlib.sha1(body).hexdigest())
+    headers = dict(response.headers)
+    headers.pop("content-length", None)
+    headers["etag"] = etag
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"etag": etag})
+    return Response(content=body, status_code=200, headers=headers, media_type=response.media_type)
+
+
+# Added after the ETag middleware so it wraps it and compresses the tagged body
+app.add_middleware(GZipMiddleware, minimum_size=API_GZIP_MIN_SIZE)
+
+
+@app.exception_handler(DeadlineExceededError)
+async def deadline_exceeded(request: Request, exc: DeadlineExceededError):
+    return JSONResponse(status_code=504, content={"detail": "Recommendation generation timed out"})
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok", "documents": get_engine().collection.count()}
+
+
+@app.get("/recommend")
+def recommend(
+    emotion: str,
+    n_results: int = Query(PRECOMPUTE_N_RESULTS, ge=1, le=50),
+    category: str = None,
+    language: str = None
+):
+    """Generate mood-based recommendations, served from the store when precomputed"""
+    if emotion not in EMOTION_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Unknown emotion. Choose one of: {', '.join(EMOTION_QUERIES)}")
+
+    engine = get_engine()
+    where = build_where(category, language)
+
+    if engine.store is not None and n_results == PRECOMPUTE_N_RESULTS:
+        recommendations = engine.store.get(emotion, where)
+        if recommendations:
+            return {"emotion": emotion, "recommendations": recommendations, "source": "precomputed"}
+
+    try:
+        recommendations = engine.compute_recommendations(emotion, n_results, where, PRIORITY_INTERACTIVE)
+    except (DeadlineExceededError, HTTPException):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Recommendation engine unavailable: {str(e)}")
+    if recommendations is None:
+        raise HTTPException(status_code=404, detail="No matching content found")
+    return {"emotion": emotion, "recommendations": recommendations, "source": "live"}
+
+
+@app.get("/search")
+def search(
+    q: str,
+    n_results: int = Query(5, ge=1, le=100),
+    category: str = None,
+    language: str = None
+):
+    """Semantic search over the catalog"""
+    try:
+        results = get_engine().query_collection(q, n_results, build_where(category, language))
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Search unavailable: {str(e)}")
+    return {"query": q, "results": format_results(results)}
+
+
+@app.get("/title/{content_id}")
+def title(content_id: int):
+    """Return a single catalog entry by its catalog id"""
+    record = get_title_record(get_engine().collection, content_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Title not found")
+    metadata = record["metadatas"][0]
+    return format_item(metadata.get("doc_id", record["ids"][0]), record["documents"][0], metadata)
+
+
+@app.get("/similar/{content_id}")
+def similar(content_id: int, n_results: int = Query(5, ge=1, le=100)):
+    """Return titles closest to the stored overview embedding of a catalog entry"""
+    engine = get_engine()
+    collection = engine.collection
+    embedding = title_query_embedding(collection, content_id)
+    if embedding is None:
+        raise HTTPException(status_code=404, detail="Title not found")
+
+    # Ask for one extra title since the title itself is the nearest match
+    results = collection.query(
+        query_embeddings=[embedding],
+        n_results=query_size(n_results + 1, *engine.layout)
+    )
+    pooled = max_pool_results(results, n_results + 1)
+    return {"id": content_id, "results": format_results(pooled, exclude_id=content_id)[:n_results]}
+
+
+if __name__ == "__main__":
+    uvicorn.run("api:app", host=API_HOST, port=API_PORT, workers=API_WORKERS)
@@ -6,7 +6,8 @@ import plotly.express as px
 import pandas as pd
 from datetime import datetime
 from data_processor import DataProcessor
-from recommendation_engine import RecommendationEngine
+from recommendation_engine import RecommendationEngine, RecommendationSession
+from recommendation_store import get_recommendation_store, start_background_refresh
 from config import *
 
 
@@ -340,6 +341,31 @@ def initialize_session_state():
         st.session_state.recommendation_engine = None
     if 'database_ready' not in st.session_state:
         st.session_state.database_ready = False
+    if 'recommendation_session' not in st.session_state:
+        st.session_state.recommendation_session = RecommendationSession()
+    if 'last_result' not in st.session_state:
+        st.session_state.last_result = None
+    if 'last_emotion' not in st.session_state:
+        st.session_state.last_emotion = None
+
+
+class StreamlitProgress:
+    """Progress callback rendering a Streamlit progress bar and status text"""
+    def __init__(self):
+        self.progress_bar = None
+        self.status_text = None
+    
+    def __call__(self, fraction, text):
+        if self.progress_bar is None:
+            self.progress_bar = st.progress(0)
+            self.status_text = st.empty()
+        self.progress_bar.progress(fraction)
+        self.status_text.text(text)
+        if fraction >= 1:
+            self.progress_bar.empty()
+            self.status_text.empty()
+            self.progress_bar = None
+            self.status_text = None
 
 
 def setup_database():
@@ -347,14 +373,28 @@ def setup_database():
     if not st.session_state.database_ready:
         with st.spinner("🔄 Initializing Netflix recommendation system..."):
             # Initialize data processor
-            data_processor = DataProcessor()
+            data_processor = DataProcessor(
+                on_progress=StreamlitProgress(),
+                on_info=st.info,
+                on_success=st.success,
+                on_error=st.error
+            )
             
             # Setup database
             if data_processor.setup_database():
                 st.session_state.data_processor = data_processor
                 st.session_state.recommendation_engine = RecommendationEngine(
-                    data_processor.get_collection()
+                    data_processor.get_collection(),
+                    on_error=st.error,
+                    embedding_model=data_processor.load_query_embedding_model()
                 )
+                
+                # Serve precomputed emotion recommendations and keep them fresh
+                if PRECOMPUTE_ENABLED:
+                    st.session_state.recommendation_engine.attach_store(
+                        get_recommendation_store(st.session_state.recommendation_engine.layout)
+                    )
+                    start_background_refresh(st.session_state.recommendation_engine)
                 st.session_state.database_ready = True
                 return True
             else:
@@ -431,6 +471,33 @@ def display_emotion_selector():
     return selected_emotion
 
 
+def fetch_recommendation_page(emotion, cursor=None):
+    """Fetch a page of recommendations and remember it in session state"""
+    with st.spinner(f"🔍 Finding perfect content for your {emotion} mood..."):
+        result = st.session_state.recommendation_engine.get_recommendation_page(
+            emotion,
+            st.session_state.recommendation_session,
+            cursor=cursor
+        )
+    st.session_state.last_result = result
+    st.session_state.last_emotion = emotion
+
+
+def display_history():
+    """Display session recommendation history in sidebar"""
+    session = st.session_state.recommendation_session
+    if session.history:
+        st.sidebar.markdown("### 🕘 Your History")
+        st.sidebar.caption(f"{len(session.seen)} titles shown this session")
+        for entry in reversed(session.history[-5:]):
+            st.sidebar.markdown(f"**{entry['emotion']}**: {', '.join(entry['titles'])}")
+        if st.sidebar.button("🗑️ Reset History"):
+            session.reset()
+            st.session_state.last_result = None
+            st.session_state.last_emotion = None
+            st.rerun()
+
+
 def display_recommendations(emotion, recommendations):
     """Display the AI-generated recommendations"""
     st.markdown(f"""
@@ -476,6 +543,9 @@ def main():
     # Display stats
     display_stats()
     
+    # Display session history
+    display_history()
+    
     # About section in sidebar
     st.sidebar.markdown("### ℹ️ About")
     st.sidebar.info(
@@ -494,17 +564,22 @@ def main():
         # Get recommendations button
         if st.button("🎯 Get My Perfect Recommendations", use_container_width=True):
             if st.session_state.recommendation_engine:
-                with st.spinner(f"🔍 Finding perfect content for your {selected_emotion} mood..."):
-                    recommendations = st.session_state.recommendation_engine.generate_emotion_based_recommendations(
-                        selected_emotion
-                    )
-                    
-                    if recommendations:
-                        display_recommendations(selected_emotion, recommendations)
-                    else:
-                        st.error("Sorry, I couldn't generate recommendations at the moment. Please try again!")
+                fetch_recommendation_page(selected_emotion)
             else:
                 st.error("Recommendation system not ready. Please refresh the page.")
+        
+        result = st.session_state.last_result
+        if result and st.session_state.last_emotion == selected_emotion:
+            if result["recommendations"]:
+                display_recommendations(selected_emotion, result["recommendations"])
+            else:
+                st.error("Sorry, I couldn't generate recommendations at the moment. Please try again!")
+            
+            # Serve the next page from the session's candidate pool
+            if result["next_cursor"] is not None:
+                if st.button("🔄 Show Me More", use_container_width=True):
+                    fetch_recommendation_page(selected_emotion, cursor=result["next_cursor"])
+                    st.rerun()
     
     with col2:
         # Current time and date
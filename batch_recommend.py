@@ -0,0 +1,259 @@
+# Batch offline recommendation job
+"""
+Batch recommendation module for Netflix chatbot
+Generates recommendations for many stored mood strings, e.g. for email campaigns
+
+Input is a JSONL file with one object per line: {"id": ..., "query": "mood text"}.
+A known EMOTION_QUERIES key may be given as "emotion" instead of "query".
+Results are appended to the output JSONL as they complete, so an interrupted
+run resumes where it left off: IDs already written without an error are skipped,
+and rows for failed IDs are dropped before those IDs are retried, so each ID
+appears once in the output.
+
+Usage:
+    python batch_recommend.py moods.jsonl recommendations.jsonl --concurrency 4
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import *
+from data_processor import DataProcessor
+from indexing import max_pool_results, query_size
+from llm_scheduler import PRIORITY_BACKGROUND
+from recommendation_engine import RecommendationEngine
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text):
+    """Collapse case and whitespace so equivalent mood strings share work"""
+    return " ".join(str(text).lower().split())
+
+
+def read_queries(input_path):
+    """Yield (id, text, emotion, query) tuples from an input JSONL file.
+
+    text is the input string as given; emotion and query are what the prompt
+    and retrieval use, normalized so equivalent moods share work.
+    """
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            record_id = str(record.get("id", line_number))
+            emotion = record.get("emotion")
+            if emotion in EMOTION_QUERIES:
+                yield record_id, emotion, emotion, EMOTION_QUERIES[emotion]
+            else:
+                text = record.get("query", "")
+                query = normalize_query(text)
+                if query:
+                    yield record_id, text, query, query
+
+
+def drop_error_records(output_path):
+    """Rewrite the output without error rows, so retried IDs are not duplicated"""
+    if not os.path.exists(output_path):
+        return 0
+    dropped = 0
+    temp_path = output_path + ".tmp"
+    with open(output_path, "r", encoding="utf-8") as src, open(temp_path, "w", encoding="utf-8") as dst:
+        for line in src:
+            try:
+                failed = "error" in json.loads(line)
+            except ValueError:
+                failed = True
+            if failed:
+                dropped += 1
+            else:
+                dst.write(line)
+    if dropped:
+        os.replace(temp_path, output_path)
+    else:
+        os.remove(temp_path)
+    return dropped
+
+
+def read_completed_ids(output_path):
+    """Return IDs already written successfully to the output file"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A partially written last line from an interrupted run
+                continue
+            if "error" not in record:
+                completed.add(str(record["id"]))
+    return completed
+
+
+def truncate_partial_line(output_path):
+    """Drop a partially written last line so appended records start on a fresh line"""
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        end = size
+        # Scan back from the end in blocks for the last newline
+        while end > 0:
+            start = max(end - 65536, 0)
+            f.seek(start)
+            block = f.read(end - start)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+        if end != size:
+            logger.info(f"Discarding {size - end} bytes of a partially written record")
+            f.truncate(end)
+
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class BatchRecommender:
+    """Embeds, retrieves and generates recommendations for batches of queries"""
+    def __init__(self, engine, embedding_model, n_results=PRECOMPUTE_N_RESULTS,
+                 batch_size=BATCH_SIZE, concurrency=BATCH_LLM_CONCURRENCY):
+        self.engine = engine
+        self.embedding_model = embedding_model
+        self.n_results = n_results
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.stats = {"records": 0, "unique_queries": 0, "llm_calls": 0, "errors": 0}
+        # Responses by prompt fingerprint, reused by identical prompts in later chunks
+        self.responses = {}
+
+    def retrieve(self, queries):
+        """Embed unique queries in one batch and run one batched vector search"""
+        embeddings = self.embedding_model.encode(queries, batch_size=EMBEDDING_BATCH_SIZE).tolist()
+        results = self.engine.collection.query(
+            query_embeddings=embeddings,
+            n_results=query_size(self.n_results, *self.engine.layout)
+        )
+        return {
+            query: max_pool_results(results, self.n_results, query_index=i)
+            for i, query in enumerate(queries)
+        }
+
+    def process_chunk(self, records, executor):
+        """Return output records for one chunk of (id, text, emotion, query) tuples"""
+        unique_queries = list(dict.fromkeys(query for _, _, _, query in records))
+        self.stats["unique_queries"] += len(unique_queries)
+        retrieved = self.retrieve(unique_queries)
+
+        # Group records whose prompt (mood plus retrieved context) is identical
+        prompts = {}
+        record_prompt = {}
+        titles = {}
+        for record_id, _, emotion, query in records:
+            results = retrieved[query]
+            prompt = self.engine.build_prompt(emotion, query, self.engine.build_context(results))
+            key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+            prompts[key] = prompt
+            record_prompt[record_id] = key
+            titles[record_id] = [meta.get("title", "Unknown Title") for meta in results["metadatas"][0]]
+
+        futures = {
+            key: executor.submit(self.engine.complete, prompt, PRIORITY_BACKGROUND)
+            for key, prompt in prompts.items()
+            if key not in self.responses
+        }
+        self.stats["llm_calls"] += len(futures)
+        for key, future in futures.items():
+            try:
+                self.responses[key] = future.result()
+            except Exception:
+                pass
+
+        output = []
+        for record_id, text, _, _ in records:
+            record = {"id": record_id, "query": text, "titles": titles[record_id]}
+            key = record_prompt[record_id]
+            if key in self.responses:
+                record["recommendations"] = self.responses[key]
+            else:
+                record["error"] = str(futures[key].exception())
+                self.stats["errors"] += 1
+            output.append(record)
+        return output
+
+    def run(self, input_path, output_path):
+        """Process every pending query and append results to the output file"""
+        truncate_partial_line(output_path)
+        dropped = drop_error_records(output_path)
+        if dropped:
+            logger.info(f"Retrying {dropped} previously failed queries")
+        completed = read_completed_ids(output_path)
+        pending = [record for record in read_queries(input_path) if record[0] not in completed]
+        logger.info(f"{len(completed)} queries already done, {len(pending)} pending")
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor, \
+                open(output_path, "a", encoding="utf-8") as out:
+            for chunk in chunked(pending, self.batch_size):
+                for record in self.process_chunk(chunk, executor):
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                # Flush per chunk so completed work survives an interruption
+                out.flush()
+
+                self.stats["records"] += len(chunk)
+                elapsed = time.monotonic() - start
+                logger.info(
+                    f"{self.stats['records']}/{len(pending)} queries, "
+                    f"{self.stats['records'] / elapsed:.1f} queries/s, "
+                    f"{self.stats['llm_calls']} LLM calls for {self.stats['unique_queries']} unique queries, "
+                    f"{self.stats['errors']} errors"
+                )
+
+        self.stats["elapsed_seconds"] = time.monotonic() - start
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate recommendations for a JSONL file of mood queries")
+    parser.add_argument("input", help="Input JSONL with id and query (or emotion) fields")
+    parser.add_argument("output", help="Output JSONL, appended to and used as the resume checkpoint")
+    parser.add_argument("--n-results", type=int, default=PRECOMPUTE_N_RESULTS, help="Titles retrieved per query")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Queries embedded and searched per batch")
+    parser.add_argument("--concurrency", type=int, default=BATCH_LLM_CONCURRENCY, help="Maximum concurrent LLM calls")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    data_processor = DataProcessor()
+    if not data_processor.initialize_chromadb():
+        raise SystemExit("Could not open the database")
+    embedding_model = data_processor.load_embedding_model()
+    if embedding_model is None:
+        raise SystemExit("Could not load the embedding model")
+
+    engine = RecommendationEngine(data_processor.get_collection())
+    recommender = BatchRecommender(
+        engine,
+        embedding_model,
+        n_results=args.n_results,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency
+    )
+    stats = recommender.run(args.input, args.output)
+    logger.info(f"Done: {json.dumps(stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,18 @@ load_dotenv()
 # API Configuration
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = "gemini-2.0-flash"
+GEMINI_USE_SYSTEM_INSTRUCTION = True  # Send static prompt instructions once as a system instruction
+
+# Gemini Scheduling Configuration
+GEMINI_REQUESTS_PER_MINUTE = 15
+GEMINI_TOKENS_PER_MINUTE = 1000000
+GEMINI_EXPECTED_OUTPUT_TOKENS = 800  # Reserved per call for quota accounting
+GEMINI_MAX_RETRIES = 4
+GEMINI_BACKOFF_BASE = 1.0  # Seconds, doubled per retry with full jitter
+GEMINI_BACKOFF_MAX = 20.0
+GEMINI_TIMEOUT = 30  # Per-call deadline in seconds, including queueing and retries
+GEMINI_BACKGROUND_TIMEOUT = 900  # Deadline for background calls, which yield to interactive ones
+GEMINI_SCHEDULER_WORKERS = 4
 
 # Database Configuration
 DB_PATH = "database/netflix_db"
@@ -19,7 +31,49 @@ COLLECTION_NAME = "netflix_movies"
 # Data Configuration
 DATASET_PATH = "data/netflix_content.csv"
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_DIMENSION = 384
+EMBEDDING_MAX_SEQ_LENGTH = 256
+
+# Index Layout Configuration
+INDEX_FIELDS_MODE = os.getenv("INDEX_FIELDS_MODE", "overview")  # "overview", "template" or "separate"
+INDEX_TEMPLATE = "{title} ({category}, {original_language}): {overview}"
+INDEX_SEPARATE_FIELDS = ["title", "overview"]
+CHUNK_MAX_WORDS = 0  # Split longer overviews into word windows; 0 disables chunking
+CHUNK_OVERLAP_WORDS = 16
+QUERY_OVERFETCH = 3  # Vectors fetched per requested title on multi-vector indexes
+INDEX_SIZE_BUDGET_MB = 50
+QUERY_LATENCY_BUDGET_MS = 50
+
+# Embedding Runtime Configuration: "torch" (SentenceTransformer) or "onnx" (int8 quantized)
+EMBEDDING_RUNTIME = os.getenv("EMBEDDING_RUNTIME", "torch")
+ONNX_MODEL_DIR = "models/all-MiniLM-L6-v2-int8"
+ONNX_MODEL_FILE = "model_int8.onnx"
+PARITY_SAMPLE_SIZE = 200
+PARITY_MIN_COSINE = 0.98  # Minimum ONNX vs PyTorch cosine similarity per sentence
 BATCH_SIZE = 500
+EMBEDDING_BATCH_SIZE = 64  # Sentences per encoder forward pass
+BATCH_LLM_CONCURRENCY = 4  # Concurrent Gemini calls in batch jobs
+
+# Index Snapshot Configuration
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_FORMAT_VERSION = 1
+INDEX_SNAPSHOT = os.getenv("INDEX_SNAPSHOT")  # Snapshot to restore into an empty database
+
+# Precomputed Recommendations Configuration
+PRECOMPUTE_ENABLED = True
+PRECOMPUTE_DIR = "database/precomputed"
+PROMPT_VERSION = "v2"  # Template in prompts.RECOMMENDATION_PROMPTS; bump when the prompt changes
+PRECOMPUTE_N_RESULTS = 10
+PRECOMPUTE_REFRESH_INTERVAL = 24 * 60 * 60  # Seconds between scheduled refreshes
+PRECOMPUTE_VARIANTS = [
+    None,
+    {"category": "movie"},
+    {"category": "series"}
+]
+
+# Session Pagination Configuration
+CANDIDATE_POOL_SIZE = 50  # Candidates fetched once per emotion and kept in the session
+PAGE_SIZE = 10  # Candidates passed to Gemini per page
 
 # Emotion to Query Mapping
 EMOTION_QUERIES = {
@@ -37,6 +91,21 @@ EMOTION_QUERIES = {
     "🧠 Curious": "educational documentaries and mystery series to satisfy curiosity"
 }
 
+# HTTP API Configuration
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+# API server processes. The Gemini quota above is per API key, so each API
+# worker schedules calls with GEMINI_REQUESTS_PER_MINUTE / API_WORKERS (and
+# likewise for tokens); set this to the real process count when starting
+# uvicorn directly. Only api.py applies it; the app and batch job use the full quota.
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+API_GZIP_MIN_SIZE = 500  # Bytes; smaller responses are sent uncompressed
+
+# Load Test Configuration
+LOAD_TEST_LLM_LATENCY_MS = 800  # Mean fake LLM response time
+LOAD_TEST_LLM_JITTER_MS = 200
+LOAD_TEST_REQUESTS_PER_MINUTE = 100000  # Scheduler limit during load tests
+
 # Streamlit Configuration
 PAGE_TITLE = "Netflix AI Recommender"
 PAGE_ICON = "🎬"
@@ -3,41 +3,62 @@
 Data processing module for Netflix recommendation chatbot
 Handles dataset loading, cleaning, and ChromaDB initialization
 """
+import functools
+import logging
 import os
 import shutil
 import pandas as pd
 import chromadb
-from sentence_transformers import SentenceTransformer
-import streamlit as st
 from config import *
+from embedding_runtime import load_embedding_model
+from indexing import build_index_entries, collection_layout, record_layout
+
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=4)
+def load_dataset(dataset_path=DATASET_PATH):
+    """Load and clean the Netflix dataset once per process"""
+    df = pd.read_csv(dataset_path)
+    
+    # Keep only rows with non-empty overviews
+    df = df.dropna(subset=["overview"])
+    df = df[df["overview"].str.strip() != ""]
+    
+    # Reset index
+    return df.reset_index(drop=True)
+
+
+@functools.lru_cache(maxsize=2)
+def get_embedding_model(model_name=EMBEDDING_MODEL, runtime=EMBEDDING_RUNTIME):
+    """Load an embedding model for the configured runtime once per process"""
+    return load_embedding_model(model_name, runtime)
 
 
 class DataProcessor:
-    def __init__(self):
+    def __init__(self, on_progress=None, on_info=None, on_success=None, on_error=None):
         self.df = None
         self.client = None
         self.collection = None
         self.embedding_model = None
+        
+        # UI hooks, e.g. Streamlit widgets in the app; log by default
+        self.on_progress = on_progress or (lambda fraction, text: logger.info(text))
+        self.on_info = on_info or logger.info
+        self.on_success = on_success or logger.info
+        self.on_error = on_error or logger.error
     
-    @st.cache_data
-    def load_and_clean_data(_self, dataset_path=DATASET_PATH):
+    def load_and_clean_data(self, dataset_path=DATASET_PATH):
         """Load and clean Netflix dataset"""
         try:
-            df = pd.read_csv(dataset_path)
-            
-            # Keep only rows with non-empty overviews
-            df = df.dropna(subset=["overview"])
-            df = df[df["overview"].str.strip() != ""]
-            
-            # Reset index
-            df = df.reset_index(drop=True)
-            
-            return df
+            # Copy so callers never mutate the process-wide cached frame
+            return load_dataset(dataset_path).copy()
         except FileNotFoundError:
-            st.error(f"Dataset file not found at {dataset_path}")
+            self.on_error(f"Dataset file not found at {dataset_path}")
             return None
         except Exception as e:
-            st.error(f"Error loading dataset: {str(e)}")
+            self.on_error(f"Error loading dataset: {str(e)}")
             return None
     
     def initialize_chromadb(self):
@@ -54,17 +75,23 @@ class DataProcessor:
             
             return True
         except Exception as e:
-            st.error(f"Error initializing ChromaDB: {str(e)}")
+            self.on_error(f"Error initializing ChromaDB: {str(e)}")
             return False
     
-    @st.cache_resource
-    def load_embedding_model(_self):
-        """Load sentence transformer model"""
+    def load_embedding_model(self):
+        """Load embedding model for the configured runtime"""
         try:
-            return SentenceTransformer(EMBEDDING_MODEL)
+            return get_embedding_model(EMBEDDING_MODEL, EMBEDDING_RUNTIME)
         except Exception as e:
-            st.error(f"Error loading embedding model: {str(e)}")
+            self.on_error(f"Error loading embedding model: {str(e)}")
+            return None
+    
+    def load_query_embedding_model(self):
+        """Load the query encoder, or None to let ChromaDB embed query text"""
+        # ChromaDB's built-in MiniLM encoder already avoids torch for queries
+        if EMBEDDING_RUNTIME == "torch":
             return None
+        return self.load_embedding_model()
     
     def setup_database(self):
         """Complete database setup process"""
@@ -77,56 +104,85 @@ class DataProcessor:
         if not self.initialize_chromadb():
             return False
         
-        # Load embedding model
+        # Check if data already exists in collection, built with the configured layout
+        if self.collection.count() > 0:
+            mode, chunk_words = collection_layout(self.collection)
+            if (mode, chunk_words) == (INDEX_FIELDS_MODE, CHUNK_MAX_WORDS):
+                self.on_info("Using existing database with {} documents".format(self.collection.count()))
+                return True
+            self.on_info(
+                f"Existing database uses the '{mode}' layout with {chunk_words} chunk words; "
+                f"rebuilding it for '{INDEX_FIELDS_MODE}' with {CHUNK_MAX_WORDS}"
+            )
+            if not self.reset_collection():
+                return False
+        
+        # Restore a prepared snapshot instead of re-encoding the dataset
+        if INDEX_SNAPSHOT and self.restore_snapshot(INDEX_SNAPSHOT):
+            return True
+        
+        # Load embedding model, only needed when populating
         self.embedding_model = self.load_embedding_model()
         if self.embedding_model is None:
             return False
         
-        # Check if data already exists in collection
-        if self.collection.count() > 0:
-            st.info("Using existing database with {} documents".format(self.collection.count()))
-            return True
-        
         # Add data to ChromaDB
         return self.populate_database()
     
+    def reset_collection(self):
+        """Drop the collection and start over with an empty one"""
+        try:
+            self.client.delete_collection(COLLECTION_NAME)
+            self.collection = self.client.get_or_create_collection(name=COLLECTION_NAME)
+            return True
+        except Exception as e:
+            self.on_error(f"Error resetting ChromaDB collection: {str(e)}")
+            return False
+    
     def populate_database(self):
         """Add data to ChromaDB in batches"""
         try:
-            progress_bar = st.progress(0)
-            status_text = st.empty()
+            record_layout(self.collection)
             
             total_batches = len(self.df) // BATCH_SIZE + (1 if len(self.df) % BATCH_SIZE != 0 else 0)
             
             for i in range(0, len(self.df), BATCH_SIZE):
                 batch = self.df.iloc[i:i+BATCH_SIZE]
-                texts = batch["overview"].tolist()
+                ids, texts, documents, metadatas = build_index_entries(batch)
                 
                 # Generate embeddings
                 embeddings = self.embedding_model.encode(texts).tolist()
                 
                 # Add to collection
                 self.collection.add(
-                    ids=[str(x) for x in batch.index],
-                    documents=texts,
+                    ids=ids,
+                    documents=documents,
                     embeddings=embeddings,
-                    metadatas=batch.to_dict("records")
+                    metadatas=metadatas
                 )
                 
                 # Update progress
                 current_batch = (i // BATCH_SIZE) + 1
                 progress = current_batch / total_batches
-                progress_bar.progress(progress)
-                status_text.text(f"Processing batch {current_batch}/{total_batches}")
+                self.on_progress(progress, f"Processing batch {current_batch}/{total_batches}")
             
-            progress_bar.empty()
-            status_text.empty()
-            
-            st.success(f"✅ Database initialized with {self.collection.count()} documents")
+            self.on_success(f"✅ Database initialized with {self.collection.count()} documents")
             return True
             
         except Exception as e:
-            st.error(f"Error populating database: {str(e)}")
+            self.on_error(f"Error populating database: {str(e)}")
+            return False
+    
+    def restore_snapshot(self, snapshot_dir):
+        """Restore the collection from an exported index snapshot"""
+        # Imported lazily to keep numpy snapshot handling out of the common path
+        from index_snapshot import restore_snapshot
+        try:
+            manifest = restore_snapshot(snapshot_dir, self.collection, on_progress=self.on_progress)
+            self.on_success(f"✅ Database restored from snapshot {manifest['version']} with {self.collection.count()} documents")
+            return True
+        except Exception as e:
+            self.on_error(f"Error restoring snapshot, rebuilding from dataset: {str(e)}")
             return False
     
     def get_collection(self):
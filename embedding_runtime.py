@@ -0,0 +1,213 @@
+# Selectable embedding runtimes
+"""
+Embedding runtime module for Netflix recommendation chatbot
+Provides the full-precision PyTorch encoder and a lightweight int8 ONNX encoder
+
+The ONNX runtime only needs onnxruntime and tokenizers at inference time, so
+processes using it avoid importing torch. Exporting the quantized model and
+checking parity against PyTorch need sentence-transformers once.
+
+Usage:
+    python embedding_runtime.py export
+    python embedding_runtime.py parity
+    python embedding_runtime.py benchmark --runtime onnx
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+from config import *
+
+
+EMBEDDING_RUNTIMES = ("torch", "onnx")
+
+
+class OnnxEmbeddingModel:
+    """Sentence encoder running an exported MiniLM through onnxruntime.
+
+    Mirrors the all-MiniLM-L6-v2 pipeline: transformer, mean pooling over the
+    attention mask and L2 normalization.
+    """
+    def __init__(self, model_dir=ONNX_MODEL_DIR, max_seq_length=EMBEDDING_MAX_SEQ_LENGTH, threads=None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, ONNX_MODEL_FILE)
+        tokenizer_path = os.path.join(model_dir, "tokenizer.json")
+        if not os.path.exists(model_path) or not os.path.exists(tokenizer_path):
+            raise FileNotFoundError(
+                f"ONNX model not found in {model_dir}. Run: python embedding_runtime.py export"
+            )
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def encode(self, sentences, batch_size=EMBEDDING_BATCH_SIZE, **kwargs):
+        """Encode sentences into normalized float32 embeddings"""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        batches = []
+        for i in range(0, len(sentences), batch_size):
+            encodings = self.tokenizer.encode_batch(list(sentences[i:i + batch_size]))
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            # Mean pooling over real tokens, then L2 normalization
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            batches.append(pooled / np.clip(norms, 1e-12, None))
+
+        if not batches:
+            return np.zeros((0, EMBEDDING_DIMENSION), dtype=np.float32)
+        embeddings = np.vstack(batches).astype(np.float32)
+        return embeddings[0] if single else embeddings
+
+
+def load_embedding_model(model_name=EMBEDDING_MODEL, runtime=EMBEDDING_RUNTIME):
+    """Load an encoder for the selected runtime"""
+    if runtime == "onnx":
+        return OnnxEmbeddingModel()
+    if runtime == "torch":
+        # Imported lazily so processes that never use torch skip the import
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    raise ValueError(f"Unknown embedding runtime '{runtime}'. Choose one of: {', '.join(EMBEDDING_RUNTIMES)}")
+
+
+def export_onnx_model(model_name=EMBEDDING_MODEL, model_dir=ONNX_MODEL_DIR):
+    """Export the PyTorch encoder to ONNX and quantize its weights to int8"""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(model_dir, exist_ok=True)
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    tokenizer.save_pretrained(model_dir)
+
+    sample = tokenizer(["An exported sample sentence"], return_tensors="pt")
+    fp32_path = os.path.join(model_dir, "model_fp32.onnx")
+    torch.onnx.export(
+        transformer,
+        (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+        fp32_path,
+        input_names=["input_ids", "attention_mask", "token_type_ids"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "token_type_ids": {0: "batch", 1: "sequence"},
+            "last_hidden_state": {0: "batch", 1: "sequence"}
+        },
+        opset_version=14
+    )
+    quantize_dynamic(fp32_path, os.path.join(model_dir, ONNX_MODEL_FILE), weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+    return model_dir
+
+
+def sample_sentences(limit, dataset_path=DATASET_PATH):
+    """Return catalog overviews to use as realistic benchmark input"""
+    import pandas as pd
+    df = pd.read_csv(dataset_path, usecols=["overview"]).dropna()
+    sentences = df["overview"].tolist()
+    return (sentences * (limit // max(len(sentences), 1) + 1))[:limit]
+
+
+def check_parity(limit=PARITY_SAMPLE_SIZE, threshold=PARITY_MIN_COSINE):
+    """Compare ONNX and PyTorch embeddings of the same sentences by cosine similarity"""
+    sentences = sample_sentences(limit) + list(EMOTION_QUERIES.values())
+    reference = load_embedding_model(runtime="torch").encode(sentences, normalize_embeddings=True)
+    candidate = load_embedding_model(runtime="onnx").encode(sentences)
+    cosine = (reference * candidate).sum(axis=1)
+    return {
+        "sentences": len(sentences),
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "threshold": threshold,
+        "passed": bool(cosine.min() >= threshold)
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unsupported"""
+    try:
+        # Unix only; imported here so Windows can still import this module
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def benchmark(runtime=EMBEDDING_RUNTIME, limit=1000, batch_size=EMBEDDING_BATCH_SIZE):
+    """Measure load time, sentences/sec and peak memory for one runtime"""
+    sentences = sample_sentences(limit)
+    rss_before = peak_rss_mb()
+
+    start = time.perf_counter()
+    model = load_embedding_model(runtime=runtime)
+    load_seconds = time.perf_counter() - start
+
+    # Warm up so one-time allocations are not timed
+    model.encode(sentences[:batch_size], batch_size=batch_size)
+
+    start = time.perf_counter()
+    model.encode(sentences, batch_size=batch_size)
+    encode_seconds = time.perf_counter() - start
+    rss_after = peak_rss_mb()
+
+    return {
+        "runtime": runtime,
+        "sentences": len(sentences),
+        "load_seconds": round(load_seconds, 3),
+        "sentences_per_second": round(len(sentences) / encode_seconds, 1),
+        "peak_rss_mb": round(rss_after, 1) if rss_after is not None else None,
+        "model_rss_mb": round(rss_after - rss_before, 1) if rss_after is not None else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage and evaluate embedding runtimes")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("export", help="Export the int8 ONNX model")
+    parity_parser = subparsers.add_parser("parity", help="Check ONNX vs PyTorch cosine similarity")
+    parity_parser.add_argument("--limit", type=int, default=PARITY_SAMPLE_SIZE)
+    benchmark_parser = subparsers.add_parser("benchmark", help="Benchmark one runtime (run once per runtime)")
+    benchmark_parser.add_argument("--runtime", choices=EMBEDDING_RUNTIMES, default=EMBEDDING_RUNTIME)
+    benchmark_parser.add_argument("--limit", type=int, default=1000)
+    benchmark_parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        print(f"Exported int8 ONNX model to {export_onnx_model()}")
+    elif args.command == "parity":
+        report = check_parity(args.limit)
+        print(json.dumps(report, indent=2))
+        if not report["passed"]:
+            sys.exit(1)
+    else:
+        print(json.dumps(benchmark(args.runtime, args.limit, args.batch_size), indent=2))
+
+
+if __name__ == "__main__":
+    main()
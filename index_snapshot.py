@@ -0,0 +1,229 @@
+# Index snapshot export and restore
+"""
+Index snapshot module for Netflix recommendation chatbot
+Exports the prepared ChromaDB index to a versioned, checksummed snapshot and
+restores it on a new node without re-encoding any text
+
+A snapshot is a directory holding:
+    manifest.json    format version, build info and file checksums
+    embeddings.npy   float16 embedding matrix, memory-mapped on restore
+    records.json     IDs, documents and typed columnar metadata
+
+Usage:
+    python index_snapshot.py export
+    python index_snapshot.py restore snapshots/netflix-<version>
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+import numpy as np
+from config import *
+from indexing import collection_layout, record_layout
+from recommendation_store import file_checksum
+
+
+SNAPSHOT_FILES = ("embeddings.npy", "records.json")
+METADATA_TYPES = {"bool": bool, "int": int, "float": float, "str": str}
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot is missing, corrupt or incompatible"""
+
+
+def is_missing(value):
+    """None or NaN, as pandas leaves for empty CSV cells"""
+    return value is None or value != value
+
+
+def infer_column_type(values):
+    """Return the narrowest metadata type name covering a column's values"""
+    present = {type(value) for value in values if not is_missing(value)}
+    if not present:
+        return "str"
+    if present == {bool}:
+        return "bool"
+    if present <= {int}:
+        return "int"
+    if present <= {int, float}:
+        return "float"
+    return "str"
+
+
+def encode_metadata(metadatas):
+    """Convert per-record metadata dicts to typed columns"""
+    names = sorted({name for metadata in metadatas for name in (metadata or {})})
+    columns = {}
+    for name in names:
+        values = [(metadata or {}).get(name) for metadata in metadatas]
+        column_type = infer_column_type(values)
+        cast = METADATA_TYPES[column_type]
+        columns[name] = {
+            "type": column_type,
+            "values": [None if is_missing(value) else cast(value) for value in values]
+        }
+    return columns
+
+
+def decode_metadata(columns, count):
+    """Convert typed columns back to per-record metadata dicts"""
+    metadatas = [{} for _ in range(count)]
+    for name, column in columns.items():
+        cast = METADATA_TYPES[column["type"]]
+        for metadata, value in zip(metadatas, column["values"]):
+            if value is not None:
+                metadata[name] = cast(value)
+    return metadatas
+
+
+def export_snapshot(collection, output_dir=SNAPSHOT_DIR, dataset_path=DATASET_PATH, page_size=BATCH_SIZE):
+    """Write the collection to a new snapshot directory and return its path"""
+    count = collection.count()
+    if count == 0:
+        raise SnapshotError("The collection is empty; build the database before exporting")
+
+    ids, documents, metadatas, embeddings = [], [], [], []
+    for offset in range(0, count, page_size):
+        page = collection.get(
+            limit=page_size,
+            offset=offset,
+            include=["embeddings", "documents", "metadatas"]
+        )
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(page["metadatas"])
+        embeddings.append(np.asarray(page["embeddings"], dtype=np.float32))
+    matrix = np.vstack(embeddings).astype(np.float16)
+
+    dataset_checksum = file_checksum(dataset_path) if os.path.exists(dataset_path) else None
+    mode, chunk_words = collection_layout(collection)
+    version = hashlib.sha256(
+        "|".join([
+            EMBEDDING_MODEL, str(matrix.shape[1]), str(dataset_checksum), str(len(ids)), mode, str(chunk_words)
+        ]).encode("utf-8")
+    ).hexdigest()[:12]
+    snapshot_dir = os.path.join(output_dir, f"{COLLECTION_NAME}-{version}")
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    np.save(os.path.join(snapshot_dir, "embeddings.npy"), matrix)
+    with open(os.path.join(snapshot_dir, "records.json"), "w", encoding="utf-8") as f:
+        json.dump({"ids": ids, "documents": documents, "metadata": encode_metadata(metadatas)}, f, ensure_ascii=False)
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "version": version,
+        "created_at": time.time(),
+        "collection_name": COLLECTION_NAME,
+        "embedding_model": EMBEDDING_MODEL,
+        "dimension": int(matrix.shape[1]),
+        "count": len(ids),
+        "dtype": "float16",
+        "dataset_sha256": dataset_checksum,
+        "index_fields_mode": mode,
+        "chunk_max_words": chunk_words,
+        "checksums": {
+            name: file_checksum(os.path.join(snapshot_dir, name)) for name in SNAPSHOT_FILES
+        }
+    }
+    with open(os.path.join(snapshot_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return snapshot_dir
+
+
+def snapshot_layout(manifest):
+    """Return the (mode, chunk_words) index layout recorded in a manifest"""
+    # Manifests written before layouts were recorded hold the original layout
+    return manifest.get("index_fields_mode", "overview"), int(manifest.get("chunk_max_words", 0))
+
+
+def load_snapshot(snapshot_dir, verify=True, dataset_path=DATASET_PATH,
+                  layout=(INDEX_FIELDS_MODE, CHUNK_MAX_WORDS)):
+    """Load and validate a snapshot, memory-mapping its embeddings"""
+    manifest_path = os.path.join(snapshot_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        raise SnapshotError(f"No snapshot manifest found in {snapshot_dir}")
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format {manifest.get('format_version')}")
+    if manifest["embedding_model"] != EMBEDDING_MODEL or manifest["dimension"] != EMBEDDING_DIMENSION:
+        raise SnapshotError(
+            f"Snapshot was built with {manifest['embedding_model']} ({manifest['dimension']}d), "
+            f"expected {EMBEDDING_MODEL} ({EMBEDDING_DIMENSION}d)"
+        )
+    if snapshot_layout(manifest) != tuple(layout):
+        mode, chunk_words = snapshot_layout(manifest)
+        raise SnapshotError(
+            f"Snapshot uses the '{mode}' index layout with {chunk_words} chunk words, "
+            f"expected '{layout[0]}' with {layout[1]}"
+        )
+    if manifest.get("dataset_sha256") and os.path.exists(dataset_path):
+        # The snapshot must index the same catalog this node serves
+        if file_checksum(dataset_path) != manifest["dataset_sha256"]:
+            raise SnapshotError(f"Snapshot was built from a different dataset than {dataset_path}")
+    if verify:
+        for name, checksum in manifest["checksums"].items():
+            if file_checksum(os.path.join(snapshot_dir, name)) != checksum:
+                raise SnapshotError(f"Checksum mismatch for {name}; the snapshot is corrupt")
+
+    embeddings = np.load(os.path.join(snapshot_dir, "embeddings.npy"), mmap_mode="r")
+    with open(os.path.join(snapshot_dir, "records.json"), "r", encoding="utf-8") as f:
+        records = json.load(f)
+    if embeddings.shape != (manifest["count"], manifest["dimension"]) or len(records["ids"]) != manifest["count"]:
+        raise SnapshotError("Snapshot contents do not match its manifest")
+
+    records["metadatas"] = decode_metadata(records.pop("metadata"), manifest["count"])
+    return manifest, embeddings, records
+
+
+def restore_snapshot(snapshot_dir, collection, on_progress=None, batch_size=BATCH_SIZE, dataset_path=DATASET_PATH):
+    """Add a snapshot's records and embeddings to an empty collection"""
+    manifest, embeddings, records = load_snapshot(snapshot_dir, dataset_path=dataset_path)
+    if collection.count() > 0:
+        raise SnapshotError("Target collection is not empty; clear it before restoring")
+
+    record_layout(collection, *snapshot_layout(manifest))
+    total = manifest["count"]
+    for i in range(0, total, batch_size):
+        collection.add(
+            ids=records["ids"][i:i + batch_size],
+            documents=records["documents"][i:i + batch_size],
+            embeddings=np.asarray(embeddings[i:i + batch_size], dtype=np.float32).tolist(),
+            metadatas=records["metadatas"][i:i + batch_size]
+        )
+        if on_progress:
+            done = min(i + batch_size, total)
+            on_progress(done / total, f"Restoring snapshot {done}/{total}")
+    return manifest
+
+
+def main():
+    from data_processor import DataProcessor
+
+    parser = argparse.ArgumentParser(description="Export or restore a prepared index snapshot")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Export the current database to a snapshot")
+    export_parser.add_argument("--output", default=SNAPSHOT_DIR, help="Directory to write the snapshot into")
+    restore_parser = subparsers.add_parser("restore", help="Restore a snapshot into an empty database")
+    restore_parser.add_argument("snapshot", help="Snapshot directory")
+    args = parser.parse_args()
+
+    data_processor = DataProcessor()
+    if not data_processor.initialize_chromadb():
+        raise SystemExit("Could not open the database")
+
+    try:
+        if args.command == "export":
+            print(f"Exported snapshot to {export_snapshot(data_processor.get_collection(), args.output)}")
+        else:
+            start = time.perf_counter()
+            manifest = restore_snapshot(args.snapshot, data_processor.get_collection())
+            print(f"Restored {manifest['count']} documents in {time.perf_counter() - start:.1f}s")
+    except SnapshotError as e:
+        raise SystemExit(str(e))
+
+
+if __name__ == "__main__":
+    main()
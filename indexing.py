@@ -0,0 +1,218 @@
+# Multi-field indexing and max-pooled retrieval
+"""
+Indexing module for Netflix recommendation chatbot
+Builds the vectors stored per title and pools query results back to titles
+
+Layouts (INDEX_FIELDS_MODE):
+    overview   one vector per title from the overview (the original layout)
+    template   one vector per title from INDEX_TEMPLATE, e.g. title plus overview
+    separate   one vector per field in INDEX_SEPARATE_FIELDS
+
+With CHUNK_MAX_WORDS set, long overviews are split into overlapping word
+windows. Multi-vector layouts tag every vector with its title's doc_id, and
+query results are max-pooled so each title appears once with its best score.
+The layout an index was built with is recorded in the collection metadata, so
+queries and reuse checks follow the index rather than the current config.
+
+Usage:
+    python indexing.py evaluate --mode template --chunk-words 64
+"""
+import argparse
+import json
+import time
+import numpy as np
+from config import *
+
+
+INDEX_MODES = ("overview", "template", "separate")
+
+
+def is_multi_vector(mode=INDEX_FIELDS_MODE, chunk_words=CHUNK_MAX_WORDS):
+    """Whether a layout can store more than one vector per title"""
+    return mode == "separate" or chunk_words > 0
+
+
+def chunk_text(text, max_words=CHUNK_MAX_WORDS, overlap=CHUNK_OVERLAP_WORDS):
+    """Split text into overlapping word windows, or return it whole"""
+    words = str(text).split()
+    if max_words <= 0 or len(words) <= max_words:
+        return [str(text)]
+    # An overlap of a whole window or more would never reach the tail
+    overlap = min(max(overlap, 0), max_words - 1)
+    step = max_words - overlap
+    return [" ".join(words[i:i + max_words]) for i in range(0, len(words) - overlap, step)]
+
+
+def field_texts(row, mode=INDEX_FIELDS_MODE, chunk_words=CHUNK_MAX_WORDS):
+    """Return (field, text) pairs to embed for one catalog row"""
+    if mode == "overview":
+        return [("overview", chunk) for chunk in chunk_text(row["overview"], chunk_words)]
+    if mode == "template":
+        # Missing values (None or NaN) render as empty strings
+        values = {key: ("" if value is None or value != value else value) for key, value in row.items()}
+        return [("template", chunk) for chunk in chunk_text(INDEX_TEMPLATE.format_map(values), chunk_words)]
+    if mode == "separate":
+        pairs = []
+        for field in INDEX_SEPARATE_FIELDS:
+            value = row.get(field)
+            if value is None or str(value).strip() == "":
+                continue
+            # Only long free-text fields are worth chunking
+            chunks = chunk_text(value, chunk_words) if field == "overview" else [str(value)]
+            pairs.extend((field, chunk) for chunk in chunks)
+        return pairs
+    raise ValueError(f"Unknown index mode '{mode}'. Choose one of: {', '.join(INDEX_MODES)}")
+
+
+def build_index_entries(batch, mode=INDEX_FIELDS_MODE, chunk_words=CHUNK_MAX_WORDS):
+    """Return ids, texts to embed, documents and metadatas for a DataFrame batch"""
+    multi_vector = is_multi_vector(mode, chunk_words)
+    ids, texts, documents, metadatas = [], [], [], []
+    for index, row in zip(batch.index, batch.to_dict("records")):
+        for position, (field, text) in enumerate(field_texts(row, mode, chunk_words)):
+            metadata = dict(row)
+            if multi_vector:
+                ids.append(f"{index}:{field}:{position}")
+                metadata["doc_id"] = str(index)
+                metadata["field"] = field
+            else:
+                ids.append(str(index))
+            texts.append(text)
+            # Keep the full overview as the document so context building is unchanged
+            documents.append(row["overview"])
+            metadatas.append(metadata)
+    return ids, texts, documents, metadatas
+
+
+def max_pool_results(results, n_results, query_index=0):
+    """Collapse per-vector query results to one entry per title, best score first"""
+    pooled = {
+        "ids": [[]],
+        "documents": [[]],
+        "metadatas": [[]],
+        "distances": [[]]
+    }
+    ids = results["ids"][query_index]
+    distances = results["distances"][query_index] if results.get("distances") else [None] * len(ids)
+    seen = set()
+    # ChromaDB returns results nearest first, so the first hit per title is its max
+    for vector_id, document, metadata, distance in zip(
+        ids,
+        results["documents"][query_index],
+        results["metadatas"][query_index],
+        distances
+    ):
+        doc_id = (metadata or {}).get("doc_id", vector_id)
+        if doc_id in seen:
+            continue
+        seen.add(doc_id)
+        pooled["ids"][0].append(doc_id)
+        pooled["documents"][0].append(document)
+        pooled["metadatas"][0].append(metadata)
+        pooled["distances"][0].append(distance)
+        if len(seen) == n_results:
+            break
+    return pooled
+
+
+def layout_metadata(mode=INDEX_FIELDS_MODE, chunk_words=CHUNK_MAX_WORDS):
+    """Collection metadata describing an index layout"""
+    return {"index_fields_mode": mode, "chunk_max_words": int(chunk_words)}
+
+
+def collection_layout(collection):
+    """Return the (mode, chunk_words) layout a collection was built with"""
+    metadata = collection.metadata or {}
+    # Collections built before layouts were recorded use the original layout
+    return metadata.get("index_fields_mode", "overview"), int(metadata.get("chunk_max_words", 0))
+
+
+def record_layout(collection, mode=INDEX_FIELDS_MODE, chunk_words=CHUNK_MAX_WORDS):
+    """Store a layout in the collection metadata, keeping other user metadata"""
+    # Index settings (hnsw:*) are fixed at creation and cannot be modified
+    metadata = {key: value for key, value in (collection.metadata or {}).items() if not key.startswith("hnsw:")}
+    metadata.update(layout_metadata(mode, chunk_words))
+    collection.modify(metadata=metadata)
+
+
+def query_size(n_results, mode=INDEX_FIELDS_MODE, chunk_words=CHUNK_MAX_WORDS):
+    """Number of vectors to fetch so pooling still yields n_results titles"""
+    return n_results * QUERY_OVERFETCH if is_multi_vector(mode, chunk_words) else n_results
+
+
+def evaluate(mode=INDEX_FIELDS_MODE, chunk_words=CHUNK_MAX_WORDS, sample=500, n_results=10, seed=0):
+    """Measure known-item retrieval quality against index size and query latency.
+
+    For a sample of titles, the title alone and the first half of the overview
+    are used as queries; a hit means the title is retrieved in the top n_results.
+    Uses an in-memory brute-force index, so layouts compare without ChromaDB.
+    """
+    from data_processor import get_embedding_model, load_dataset
+
+    df = load_dataset()
+    model = get_embedding_model()
+
+    start = time.perf_counter()
+    ids, texts, _, metadatas = build_index_entries(df, mode, chunk_words)
+    vectors = np.asarray(model.encode(texts, batch_size=EMBEDDING_BATCH_SIZE), dtype=np.float32)
+    vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+    encode_seconds = time.perf_counter() - start
+    doc_ids = [metadata.get("doc_id", vector_id) for vector_id, metadata in zip(ids, metadatas)]
+
+    sampled = df.sample(n=min(sample, len(df)), random_state=seed)
+    queries, targets = [], []
+    for index, row in sampled.iterrows():
+        words = str(row["overview"]).split()
+        queries.extend([str(row["title"]), " ".join(words[:max(len(words) // 2, 1)])])
+        targets.extend([str(index), str(index)])
+    query_vectors = np.asarray(model.encode(queries, batch_size=EMBEDDING_BATCH_SIZE), dtype=np.float32)
+    query_vectors /= np.clip(np.linalg.norm(query_vectors, axis=1, keepdims=True), 1e-12, None)
+
+    hits, reciprocal_ranks, latencies = 0, 0.0, []
+    fetch = query_size(n_results, mode, chunk_words)
+    for query_vector, target in zip(query_vectors, targets):
+        start = time.perf_counter()
+        scores = vectors @ query_vector
+        top = np.argpartition(-scores, min(fetch, len(scores) - 1))[:fetch]
+        top = top[np.argsort(-scores[top])]
+        ranked = list(dict.fromkeys(doc_ids[i] for i in top))[:n_results]
+        latencies.append((time.perf_counter() - start) * 1000)
+        if target in ranked:
+            hits += 1
+            reciprocal_ranks += 1.0 / (ranked.index(target) + 1)
+
+    index_mb = vectors.nbytes / (1024 * 1024)
+    p95_ms = float(np.percentile(latencies, 95))
+    recall = hits / len(queries)
+    return {
+        "mode": mode,
+        "chunk_words": chunk_words,
+        "titles": len(df),
+        "vectors": len(ids),
+        "vectors_per_title": round(len(ids) / len(df), 2),
+        f"recall@{n_results}": round(recall, 4),
+        "mrr": round(reciprocal_ranks / len(queries), 4),
+        "encode_seconds": round(encode_seconds, 2),
+        "recall_per_encode_second": round(recall / encode_seconds, 5),
+        "index_mb": round(index_mb, 2),
+        "query_p95_ms": round(p95_ms, 3),
+        "within_budget": index_mb <= INDEX_SIZE_BUDGET_MB and p95_ms <= QUERY_LATENCY_BUDGET_MS
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate index layouts")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    evaluate_parser = subparsers.add_parser("evaluate", help="Measure retrieval quality, size and latency")
+    evaluate_parser.add_argument("--mode", choices=INDEX_MODES, default=INDEX_FIELDS_MODE)
+    evaluate_parser.add_argument("--chunk-words", type=int, default=CHUNK_MAX_WORDS)
+    evaluate_parser.add_argument("--sample", type=int, default=500)
+    evaluate_parser.add_argument("--n-results", type=int, default=10)
+    args = parser.parse_args()
+
+    report = evaluate(args.mode, args.chunk_words, args.sample, args.n_results)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# Rate-limited scheduling for Gemini calls
+"""
+LLM call scheduler for Netflix recommendation chatbot
+Handles rate limiting, retries with backoff, deadlines and priorities
+
+The scheduler only needs a client exposing
+``generate_content(prompt, request_options=None)`` that returns an object
+with a ``text`` attribute, so a local fake client can stand in for Gemini.
+"""
+import itertools
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from config import *
+
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "InternalServerError",
+    "DeadlineExceeded",
+}
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when a call cannot complete before its deadline"""
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate"""
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount=1):
+        """Seconds until tokens are available, without taking them"""
+        amount = min(amount, self.capacity)
+        with self.lock:
+            self._refill()
+            return max(amount - self.tokens, 0.0) / self.rate
+
+    def consume(self, amount=1):
+        """Take tokens, possibly going into debt that later refills repay"""
+        with self.lock:
+            self._refill()
+            self.tokens -= min(amount, self.capacity)
+
+
+def is_retryable(error):
+    """Return True for rate limit, timeout and transient server errors"""
+    if isinstance(error, (TimeoutError, ConnectionError)) and not isinstance(error, DeadlineExceededError):
+        return True
+    code = getattr(error, "code", None)
+    if callable(code):
+        try:
+            code = code()
+        except Exception:
+            code = None
+    if isinstance(code, int) and code in RETRYABLE_STATUS_CODES:
+        return True
+    if type(error).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    return "429" in str(error)
+
+
+def estimate_tokens(prompt, max_output_tokens=GEMINI_EXPECTED_OUTPUT_TOKENS):
+    """Rough token estimate (about 4 characters per token) for quota accounting"""
+    return len(prompt) // 4 + max_output_tokens
+
+
+class LLMScheduler:
+    """Priority queue of LLM calls dispatched under rate limits.
+
+    A single dispatcher hands out the highest-priority job only once a worker
+    is free and quota is available, so jobs never hold a worker while waiting
+    for tokens and a newly queued interactive call overtakes waiting
+    background ones. Retries are re-queued after their backoff delay and pass
+    through the rate limits again.
+    """
+    def __init__(
+        self,
+        client,
+        requests_per_minute=GEMINI_REQUESTS_PER_MINUTE,
+        tokens_per_minute=GEMINI_TOKENS_PER_MINUTE,
+        max_retries=GEMINI_MAX_RETRIES,
+        base_delay=GEMINI_BACKOFF_BASE,
+        max_delay=GEMINI_BACKOFF_MAX,
+        timeout=GEMINI_TIMEOUT,
+        background_timeout=GEMINI_BACKGROUND_TIMEOUT,
+        workers=GEMINI_SCHEDULER_WORKERS
+    ):
+        self.client = client
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.background_timeout = background_timeout
+        self.queue = queue.PriorityQueue()
+        self.counter = itertools.count()
+        self.wakeup = threading.Event()
+        self.free_workers = threading.Semaphore(workers)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-scheduler")
+        self.stats_lock = threading.Lock()
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "retries": 0, "deadline_exceeded": 0}
+        self.dispatcher = threading.Thread(target=self._dispatch, name="llm-scheduler-dispatcher", daemon=True)
+        self.dispatcher.start()
+
+    def submit(self, prompt, priority=PRIORITY_INTERACTIVE, timeout=None):
+        """Queue a prompt and return a Future resolving to the response text"""
+        if timeout is None:
+            timeout = self.background_timeout if priority >= PRIORITY_BACKGROUND else self.timeout
+        job = {
+            "prompt": prompt,
+            "priority": priority,
+            "deadline": time.monotonic() + timeout,
+            "tokens": estimate_tokens(prompt),
+            "attempt": 0,
+            "future": Future()
+        }
+        self._count("submitted")
+        self._enqueue(job)
+        return job["future"]
+
+    def generate(self, prompt, priority=PRIORITY_INTERACTIVE, timeout=None):
+        """Submit a prompt and block until its response text is ready"""
+        return self.submit(prompt, priority, timeout).result()
+
+    def get_stats(self):
+        """Return a snapshot of scheduler counters"""
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats["queued"] = self.queue.qsize()
+        return stats
+
+    def _count(self, key, amount=1):
+        with self.stats_lock:
+            self.stats[key] += amount
+
+    def _enqueue(self, job):
+        self.queue.put((job["priority"], next(self.counter), job))
+        self.wakeup.set()
+
+    def _backoff(self, attempt):
+        """Full-jitter exponential backoff delay for a retry attempt"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _fail(self, job, error):
+        self._count("deadline_exceeded" if isinstance(error, DeadlineExceededError) else "failed")
+        if not job["future"].done():
+            job["future"].set_exception(error)
+
+    def _dispatch(self):
+        while True:
+            # Only take a job once it could actually run
+            self.free_workers.acquire()
+            while True:
+                self.wakeup.clear()
+                _, _, job = self.queue.get()
+                if job["future"].cancelled():
+                    continue
+
+                wait = max(
+                    self.request_bucket.wait_time(1),
+                    self.token_bucket.wait_time(job["tokens"])
+                )
+                if time.monotonic() + wait > job["deadline"]:
+                    self._fail(job, DeadlineExceededError("Rate limit wait would exceed the call deadline"))
+                    continue
+                if wait == 0.0:
+                    break
+
+                # Put the job back and wait for quota, waking early when a new
+                # job arrives so it can be considered by priority
+                self.queue.put((job["priority"], next(self.counter), job))
+                self.wakeup.wait(wait)
+
+            self.request_bucket.consume(1)
+            self.token_bucket.consume(job["tokens"])
+            self.executor.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            remaining = job["deadline"] - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceededError("Call deadline exceeded before the request was sent")
+            if job["attempt"] == 0 and not job["future"].set_running_or_notify_cancel():
+                return
+
+            try:
+                response = self.client.generate_content(job["prompt"], request_options={"timeout": remaining})
+            except Exception as e:
+                if job["attempt"] >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = self._backoff(job["attempt"])
+                if time.monotonic() + delay >= job["deadline"]:
+                    raise DeadlineExceededError(f"No time left to retry after: {str(e)}") from e
+                self._count("retries")
+                job["attempt"] += 1
+                timer = threading.Timer(delay, self._enqueue, args=(job,))
+                timer.daemon = True
+                timer.start()
+                return
+
+            job["future"].set_result(response.text)
+            self._count("completed")
+        except Exception as e:
+            self._fail(job, e)
+        finally:
+            self.free_workers.release()
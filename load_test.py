@@ -0,0 +1,388 @@
+# Load test harness for concurrent sessions
+"""
+Load testing module for Netflix recommendation chatbot
+Simulates concurrent Streamlit sessions end to end against a local fake LLM
+
+Each simulated session follows the app's main flow without a Streamlit
+runtime: setup_database (DataProcessor plus RecommendationEngine, with the
+precomputed store and background refresher when --precompute is set), the
+sidebar stats, then a number of recommendation clicks and "Show Me More"
+pages. Sessions run on threads, like Streamlit script runs. One warm-up
+session runs first so model and dataset loading stay out of the memory
+baseline. The report covers throughput, latency percentiles, a per-stage
+breakdown and memory growth per session, and is written as JSON to compare
+capacity across versions.
+
+Usage:
+    python load_test.py --sessions 50 --requests 3 --output load_report.json
+    python load_test.py --sessions 50 --compare load_report_previous.json
+"""
+import argparse
+import json
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from config import *
+from data_processor import DataProcessor
+from llm_scheduler import LLMScheduler, PRIORITY_INTERACTIVE
+from recommendation_engine import RecommendationEngine, RecommendationSession, get_coalescing_stats
+from recommendation_store import RecommendationRefresher, RecommendationStore, compute_store_version
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeRateLimitError(Exception):
+    """Mimics a Gemini 429 so retry paths are exercised"""
+    code = 429
+
+
+class FakeLLMClient:
+    """Local stand-in for the Gemini model with configurable latency and errors"""
+    def __init__(self, latency_ms=LOAD_TEST_LLM_LATENCY_MS, jitter_ms=LOAD_TEST_LLM_JITTER_MS,
+                 rate_limit_ratio=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit_ratio = rate_limit_ratio
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def generate_content(self, prompt, request_options=None):
+        with self.lock:
+            self.calls += 1
+            delay = max(self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms), 0) / 1000
+            rate_limited = self.random.random() < self.rate_limit_ratio
+        time.sleep(delay)
+        if rate_limited:
+            raise FakeRateLimitError("429 Resource has been exhausted")
+        return FakeResponse(f"Fake recommendations for a {len(prompt)} character prompt")
+
+
+class StageTimer:
+    """Thread-safe collector of per-stage durations in milliseconds"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def record(self, stage, start):
+        elapsed = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.samples[stage].append(elapsed)
+        return elapsed
+
+    def summary(self):
+        with self.lock:
+            return {stage: summarize(values) for stage, values in self.samples.items()}
+
+
+class InstrumentedEngine(RecommendationEngine):
+    """Recommendation engine that times retrieval and generation stages"""
+    def __init__(self, *args, timer=None, **kwargs):
+        self.timer = timer
+        super().__init__(*args, **kwargs)
+
+    def query_collection(self, query, n_results=5, where=None):
+        start = time.perf_counter()
+        try:
+            return super().query_collection(query, n_results, where)
+        finally:
+            self.timer.record("search", start)
+
+    def complete(self, prompt, priority=PRIORITY_INTERACTIVE):
+        start = time.perf_counter()
+        try:
+            return super().complete(prompt, priority)
+        finally:
+            self.timer.record("generate", start)
+
+
+def summarize(values):
+    """Count, mean and percentiles of millisecond samples"""
+    if not values:
+        return {"count": 0}
+    data = np.asarray(values)
+    return {
+        "count": len(values),
+        "mean_ms": round(float(data.mean()), 2),
+        "p50_ms": round(float(np.percentile(data, 50)), 2),
+        "p90_ms": round(float(np.percentile(data, 90)), 2),
+        "p95_ms": round(float(np.percentile(data, 95)), 2),
+        "p99_ms": round(float(np.percentile(data, 99)), 2),
+        "max_ms": round(float(data.max()), 2)
+    }
+
+
+def current_rss_mb():
+    """Current resident set size in MB (peak RSS where /proc is unavailable, None on Windows)"""
+    try:
+        # Unix only; imported here so the harness still runs on Windows
+        import resource
+    except ImportError:
+        return None
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / (1024 * 1024)
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class LoadTest:
+    """Runs simulated sessions and collects the load report"""
+    def __init__(self, sessions, requests_per_session, pages_per_request, concurrency,
+                 think_time_ms, client, scheduler, seed=0, precompute=False):
+        self.sessions = sessions
+        self.requests_per_session = requests_per_session
+        self.pages_per_request = pages_per_request
+        self.concurrency = concurrency
+        self.think_time_ms = think_time_ms
+        self.client = client
+        self.scheduler = scheduler
+        self.seed = seed
+        self.precompute = precompute
+        self.store = None
+        self.refresher = None
+        self.timer = StageTimer()
+        self.lock = threading.Lock()
+        self.errors = defaultdict(int)
+        # Held until the end, like per-session st.session_state, to measure retention
+        self.session_states = []
+
+    def setup_session(self):
+        """Mirror app.setup_database for one new session"""
+        start = time.perf_counter()
+        data_processor = DataProcessor()
+        if not data_processor.setup_database():
+            raise RuntimeError("Database setup failed")
+        engine = InstrumentedEngine(
+            data_processor.get_collection(),
+            # The engine reports failures instead of raising, so count them here
+            on_error=lambda message: self._error(f"engine: {message.split(':')[0]}"),
+            embedding_model=data_processor.load_query_embedding_model(),
+            model=self.client,
+            scheduler=self.scheduler,
+            timer=self.timer
+        )
+        if self.precompute:
+            self.attach_precompute(engine)
+        self.timer.record("setup_database", start)
+        return {"data_processor": data_processor, "engine": engine, "session": RecommendationSession()}
+
+    def attach_precompute(self, engine):
+        """Attach the precomputed store, starting its refresher once, as the app does"""
+        with self.lock:
+            if self.store is None:
+                # A throwaway directory keeps fake LLM output out of the real store
+                self.store = RecommendationStore(
+                    tempfile.mkdtemp(prefix="load_test_store_"),
+                    version=compute_store_version(layout=engine.layout)
+                )
+                self.refresher = RecommendationRefresher(engine, self.store)
+                self.refresher.start()
+        engine.attach_store(self.store)
+
+    def warm_up(self):
+        """Run one unmeasured session so one-time loading is not counted as growth"""
+        timer, errors = self.timer, self.errors
+        self.timer, self.errors = StageTimer(), defaultdict(int)
+        start = time.perf_counter()
+        try:
+            self.run_session(self.sessions)
+        finally:
+            warm_up_errors = self.errors
+            self.timer, self.errors = timer, errors
+            with self.lock:
+                self.session_states.clear()
+        return {"seconds": round(time.perf_counter() - start, 2), "errors": dict(warm_up_errors)}
+
+    def run_session(self, session_index):
+        rng = random.Random(self.seed + session_index)
+        try:
+            state = self.setup_session()
+        except Exception as e:
+            self._error(f"setup: {type(e).__name__}")
+            return
+
+        start = time.perf_counter()
+        state["data_processor"].get_stats()
+        self.timer.record("display_stats", start)
+
+        emotions = list(EMOTION_QUERIES)
+        for _ in range(self.requests_per_session):
+            emotion = rng.choice(emotions)
+            cursor = None
+            for page in range(self.pages_per_request):
+                start = time.perf_counter()
+                try:
+                    result = state["engine"].get_recommendation_page(emotion, state["session"], cursor=cursor)
+                    self.timer.record("recommendation" if page == 0 else "show_more", start)
+                    self.timer.record("request", start)
+                except Exception as e:
+                    self._error(f"recommendation: {type(e).__name__}")
+                    break
+                cursor = result["next_cursor"]
+                if cursor is None:
+                    break
+                if self.think_time_ms:
+                    time.sleep(rng.uniform(0, 2 * self.think_time_ms) / 1000)
+
+        with self.lock:
+            self.session_states.append(state)
+
+    def _error(self, key):
+        with self.lock:
+            self.errors[key] += 1
+
+    def run(self):
+        rss_before_warm_up = current_rss_mb()
+        warm_up = self.warm_up()
+        rss_start = current_rss_mb()
+        llm_calls_start = self.client.calls
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                list(executor.map(self.run_session, range(self.sessions)))
+            elapsed = time.perf_counter() - start
+            rss_end = current_rss_mb()
+        finally:
+            if self.refresher is not None:
+                # An in-flight refresh would recreate the directory when it finishes
+                if self.refresher.stop(timeout=GEMINI_BACKGROUND_TIMEOUT):
+                    shutil.rmtree(self.store.store_dir, ignore_errors=True)
+                else:
+                    print(f"Refresher still running; leaving {self.store.store_dir} in place", file=sys.stderr)
+
+        stages = self.timer.summary()
+        requests = stages.get("request", {}).get("count", 0)
+        return {
+            "revision": git_revision(),
+            "timestamp": time.time(),
+            "config": {
+                "sessions": self.sessions,
+                "requests_per_session": self.requests_per_session,
+                "pages_per_request": self.pages_per_request,
+                "concurrency": self.concurrency,
+                "think_time_ms": self.think_time_ms,
+                "precompute": self.precompute,
+                "llm_latency_ms": self.client.latency_ms,
+                "llm_rate_limit_ratio": self.client.rate_limit_ratio,
+                "index_fields_mode": INDEX_FIELDS_MODE,
+                "embedding_runtime": EMBEDDING_RUNTIME,
+                "prompt_version": PROMPT_VERSION
+            },
+            "elapsed_seconds": round(elapsed, 2),
+            "throughput_rps": round(requests / elapsed, 2) if elapsed else 0,
+            "sessions_completed": len(self.session_states),
+            "latency": stages.pop("request", {"count": 0}),
+            "stages": stages,
+            "warm_up": warm_up,
+            "memory": {
+                "rss_before_warm_up_mb": round(rss_before_warm_up, 1),
+                "rss_start_mb": round(rss_start, 1),
+                "rss_end_mb": round(rss_end, 1),
+                "growth_per_session_mb": round((rss_end - rss_start) / max(self.sessions, 1), 3)
+            } if rss_start is not None else None,
+            "errors": dict(self.errors),
+            "llm_calls": self.client.calls - llm_calls_start,
+            "refresher": dict(self.refresher.stats) if self.refresher is not None else None,
+            "scheduler": self.scheduler.get_stats(),
+            "coalescing": get_coalescing_stats()
+        }
+
+
+def compare_reports(current, previous):
+    """Relative change of headline metrics against a previous report"""
+    def change(new, old):
+        return round((new - old) / old * 100, 1) if old and new is not None else None
+
+    metrics = {
+        "throughput_rps": (current["throughput_rps"], previous["throughput_rps"]),
+        "latency_p95_ms": (current["latency"].get("p95_ms", 0), previous["latency"].get("p95_ms", 0)),
+        "latency_p99_ms": (current["latency"].get("p99_ms", 0), previous["latency"].get("p99_ms", 0)),
+        "growth_per_session_mb": (
+            (current["memory"] or {}).get("growth_per_session_mb"),
+            (previous["memory"] or {}).get("growth_per_session_mb")
+        )
+    }
+    return {
+        "previous_revision": previous.get("revision"),
+        "metrics": {
+            name: {"current": new, "previous": old, "change_percent": change(new, old)}
+            for name, (new, old) in metrics.items()
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the recommendation flow with simulated sessions")
+    parser.add_argument("--sessions", type=int, default=20, help="Simulated user sessions")
+    parser.add_argument("--requests", type=int, default=3, help="Recommendation clicks per session")
+    parser.add_argument("--pages", type=int, default=2, help="Pages per click, including 'Show Me More'")
+    parser.add_argument("--concurrency", type=int, default=10, help="Sessions running at the same time")
+    parser.add_argument("--think-time-ms", type=float, default=0, help="Mean pause between page requests")
+    parser.add_argument("--llm-latency-ms", type=float, default=LOAD_TEST_LLM_LATENCY_MS)
+    parser.add_argument("--llm-rate-limit-ratio", type=float, default=0.0, help="Share of fake LLM calls returning 429")
+    parser.add_argument("--rpm", type=int, default=LOAD_TEST_REQUESTS_PER_MINUTE,
+                        help="Scheduler request limit; defaults high so the app, not quota, is measured")
+    parser.add_argument("--precompute", action=argparse.BooleanOptionalAction, default=PRECOMPUTE_ENABLED,
+                        help="Attach the precomputed store and run its background refresher, as the app does")
+    parser.add_argument("--output", default="load_report.json", help="JSON report path")
+    parser.add_argument("--compare", help="Previous JSON report to compare against")
+    args = parser.parse_args()
+
+    client = FakeLLMClient(args.llm_latency_ms, rate_limit_ratio=args.llm_rate_limit_ratio)
+    scheduler = LLMScheduler(
+        client,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.rpm * 10000,
+        base_delay=0.05,
+        workers=max(args.concurrency, GEMINI_SCHEDULER_WORKERS)
+    )
+    report = LoadTest(
+        args.sessions,
+        args.requests,
+        args.pages,
+        args.concurrency,
+        args.think_time_ms,
+        client,
+        scheduler,
+        precompute=args.precompute
+    ).run()
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            report["comparison"] = compare_reports(report, json.load(f))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(json.dumps({
+        "throughput_rps": report["throughput_rps"],
+        "latency": report["latency"],
+        "memory": report["memory"],
+        "errors": report["errors"]
+    }, indent=2))
+    print(f"Full report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
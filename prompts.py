@@ -0,0 +1,140 @@
+# Prompt templates for Gemini
+"""
+Prompt module for Netflix recommendation chatbot
+Holds versioned, precompiled prompt templates and emotion labels
+
+Each template separates the static instruction block from the per-request
+part. When the Gemini client accepts a system instruction, the static block
+is sent once with the model and each request carries only the dynamic part;
+otherwise both are rendered inline into a single prompt.
+"""
+import hashlib
+from config import *
+
+
+# Emotion keys are "<emoji> <Label>"; strip the emoji once instead of per request
+EMOTION_LABELS = {emotion: emotion.split(maxsplit=1)[-1] for emotion in EMOTION_QUERIES}
+_EMOJI_TABLE = str.maketrans("", "", "".join(emotion.split(maxsplit=1)[0] for emotion in EMOTION_QUERIES))
+
+
+def emotion_label(emotion):
+    """Return the emotion name without its emoji"""
+    label = EMOTION_LABELS.get(emotion)
+    if label is None:
+        label = emotion.translate(_EMOJI_TABLE).strip()
+    return label
+
+
+CONTEXT_ENTRY = """
+Title: {title}
+Type: {category}
+Genre: {genre}
+Year: {year}
+Rating: {rating}
+Overview: {overview}...
+
+---
+"""
+
+
+def render_context(results):
+    """Render search results into the context block of a prompt"""
+    entries = []
+    for doc, meta in zip(results["documents"][0], results["metadatas"][0]):
+        entries.append(CONTEXT_ENTRY.format(
+            title=meta.get('title', 'Unknown Title'),
+            category=meta.get('category', 'Unknown Category'),
+            genre=meta.get('genre', 'Unknown Genre'),
+            year=meta.get('year', 'Unknown Year'),
+            rating=meta.get('rating', 'Not Rated'),
+            overview=doc[:300]
+        ))
+    return "".join(entries)
+
+
+class PromptTemplate:
+    """A versioned prompt split into a static instruction block and a request template"""
+    def __init__(self, version, system_instruction, request_template):
+        self.version = version
+        self.system_instruction = system_instruction
+        self.request_template = request_template
+        self.fingerprint = hashlib.sha256(
+            (system_instruction + request_template).encode("utf-8")
+        ).hexdigest()[:12]
+
+    def render(self, emotion, emotion_query, context, inline_instructions=True):
+        """Render the request, with the instruction block appended when inline"""
+        request = self.request_template.format(
+            label=emotion_label(emotion),
+            emotion=emotion,
+            emotion_query=emotion_query,
+            context=context
+        )
+        if inline_instructions:
+            return f"\n{request}\n{self.system_instruction}"
+        return request
+
+
+RECOMMENDATION_PROMPTS = {
+    "v1": PromptTemplate(
+        "v1",
+        system_instruction="""INSTRUCTIONS:
+1. Recommend exactly 5 titles from the provided context
+2. For each recommendation, provide:
+   - Title and type (Movie/TV Show)
+   - Why it matches their current mood
+   - Brief engaging description (2-3 sentences)
+   - What makes it special or unique
+
+3. Format your response in a warm, personalized tone
+4. Start with acknowledging their mood
+5. Use emojis appropriately to match the mood
+6. End with an encouraging note about enjoying their viewing experience
+
+Make the recommendations feel personal and thoughtful, as if coming from a close friend who knows their taste perfectly.
+""",
+        request_template="""You are Netflix's premium AI recommendation assistant. A user is feeling {label} and wants content recommendations.
+
+User's Current Mood: {emotion}
+Content Preference: {emotion_query}
+
+Here are the top matching titles from Netflix's catalog:
+{context}
+"""
+    ),
+    "v2": PromptTemplate(
+        "v2",
+        system_instruction="""You are Netflix's premium AI recommendation assistant. Each request describes a user's mood, their content preference and the top matching titles from Netflix's catalog.
+
+INSTRUCTIONS:
+1. Recommend exactly 5 titles from the provided context
+2. For each recommendation, provide:
+   - Title and type (Movie/TV Show)
+   - Why it matches their current mood
+   - Brief engaging description (2-3 sentences)
+   - What makes it special or unique
+
+3. Format your response in a warm, personalized tone
+4. Start with acknowledging their mood
+5. Use emojis appropriately to match the mood
+6. End with an encouraging note about enjoying their viewing experience
+
+Make the recommendations feel personal and thoughtful, as if coming from a close friend who knows their taste perfectly.
+""",
+        request_template="""A user is feeling {label} and wants content recommendations.
+
+User's Current Mood: {emotion}
+Content Preference: {emotion_query}
+
+Here are the top matching titles from Netflix's catalog:
+{context}
+"""
+    )
+}
+
+
+def get_prompt_template(version=PROMPT_VERSION):
+    """Return the prompt template for a version"""
+    if version not in RECOMMENDATION_PROMPTS:
+        raise ValueError(f"Unknown prompt version '{version}'. Choose one of: {', '.join(RECOMMENDATION_PROMPTS)}")
+    return RECOMMENDATION_PROMPTS[version]
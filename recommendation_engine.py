@@ -3,52 +3,254 @@
 Recommendation engine module for Netflix chatbot
 Handles RAG pipeline and Gemini AI integration
 """
+import hashlib
+import json
+import logging
+import threading
 import google.generativeai as genai
-import streamlit as st
 from config import *
+from indexing import collection_layout, max_pool_results, query_size
+from llm_scheduler import LLMScheduler, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from prompts import get_prompt_template, render_context
+
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls into one upstream computation.
+    
+    Callers sharing a key while a call is in flight wait for it and receive
+    the same result (or exception) instead of issuing their own call.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.stats = {"requests": 0, "upstream_calls": 0, "coalesced": 0}
+    
+    def do(self, key, fn):
+        """Run fn once per key among concurrent callers and share its result"""
+        with self.lock:
+            self.stats["requests"] += 1
+            call = self.in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = {"event": threading.Event(), "result": None, "error": None}
+                self.in_flight[key] = call
+            else:
+                self.stats["coalesced"] += 1
+        
+        if not leader:
+            call["event"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+        
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self.lock:
+                self.stats["upstream_calls"] += 1
+                del self.in_flight[key]
+            call["event"].set()
+    
+    def get_stats(self):
+        """Return a snapshot of coalescing counters"""
+        with self.lock:
+            return dict(self.stats)
+
+
+# Shared across all engines so identical requests from different sessions coalesce
+_search_flight = SingleFlight()
+_gemini_flight = SingleFlight()
+
+# One scheduler per process since Gemini rate limits apply per API key
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(model, processes=1):
+    """Return the process-wide Gemini call scheduler, creating it on first use.
+    
+    processes is the number of identical processes sharing the API key, such
+    as API server workers; each schedules calls within an equal share of it.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            processes = max(processes, 1)
+            _scheduler = LLMScheduler(
+                model,
+                requests_per_minute=max(GEMINI_REQUESTS_PER_MINUTE / processes, 1),
+                tokens_per_minute=max(GEMINI_TOKENS_PER_MINUTE / processes, 1)
+            )
+        return _scheduler
+
+
+def get_coalescing_stats():
+    """Return request coalescing metrics for ChromaDB searches and Gemini calls"""
+    return {
+        "search": _search_flight.get_stats(),
+        "gemini": _gemini_flight.get_stats()
+    }
+
+
+class SeenBitmap:
+    """Compact set of shown content IDs backed by a bytearray bitmap"""
+    def __init__(self):
+        self.bits = bytearray()
+        self.other_ids = set()
+        self.size = 0
+    
+    def add(self, content_id):
+        """Mark a content ID as shown"""
+        if content_id in self:
+            return
+        key = str(content_id)
+        if key.isdigit():
+            index = int(key)
+            byte = index >> 3
+            if byte >= len(self.bits):
+                self.bits.extend(bytes(byte - len(self.bits) + 1))
+            self.bits[byte] |= 1 << (index & 7)
+        else:
+            self.other_ids.add(key)
+        self.size += 1
+    
+    def __contains__(self, content_id):
+        key = str(content_id)
+        if key.isdigit():
+            index = int(key)
+            byte = index >> 3
+            return byte < len(self.bits) and bool(self.bits[byte] & (1 << (index & 7)))
+        return key in self.other_ids
+    
+    def __len__(self):
+        return self.size
+
+
+class RecommendationSession:
+    """Per-user recommendation history, candidate pools and cursors"""
+    def __init__(self):
+        self.seen = SeenBitmap()
+        self.candidates = {}
+        self.cursors = {}
+        self.history = []
+    
+    def reset(self):
+        """Forget everything shown in this session"""
+        self.__init__()
 
 
 class RecommendationEngine:
-    def __init__(self, collection):
+    def __init__(self, collection, on_error=None, embedding_model=None, model=None, scheduler=None,
+                 processes=1):
         self.collection = collection
+        # Layout the index was built with, which decides how far to over-fetch
+        self.layout = collection_layout(collection)
+        # Optional query encoder; ChromaDB embeds query text when not set
+        self.embedding_model = embedding_model
+        # Error reporter, e.g. st.error in the Streamlit app; logs by default
+        self.on_error = on_error or logger.error
         self.model = None
-        self.initialize_gemini()
+        self.scheduler = None
+        self.store = None
+        self.prompt_template = get_prompt_template(PROMPT_VERSION)
+        self.use_system_instruction = False
+        # Processes sharing the Gemini quota with this one, see get_scheduler
+        self.processes = processes
+        if model is None:
+            self.initialize_gemini()
+        else:
+            # Injected client, e.g. a local fake for load tests. The process
+            # scheduler may already wrap another client, so never fall back to it.
+            self.model = model
+            self.scheduler = scheduler or LLMScheduler(model)
     
     def initialize_gemini(self):
         """Initialize Gemini AI model"""
         try:
             if not GEMINI_API_KEY:
-                st.error("🔑 Gemini API key not found! Please set GEMINI_API_KEY in your .env file")
+                self.on_error("🔑 Gemini API key not found! Please set GEMINI_API_KEY in your .env file")
                 return False
             
             genai.configure(api_key=GEMINI_API_KEY)
-            self.model = genai.GenerativeModel(GEMINI_MODEL)
+            self.model = self.create_model()
+            self.scheduler = get_scheduler(self.model, self.processes)
             return True
             
         except Exception as e:
-            st.error(f"Error initializing Gemini: {str(e)}")
+            self.on_error(f"Error initializing Gemini: {str(e)}")
             return False
     
-    def search_content(self, query, n_results=5):
-        """Search for content in ChromaDB based on query"""
-        try:
+    def create_model(self):
+        """Create the Gemini model, carrying the static instructions when supported"""
+        if GEMINI_USE_SYSTEM_INSTRUCTION:
+            try:
+                model = genai.GenerativeModel(
+                    GEMINI_MODEL,
+                    system_instruction=self.prompt_template.system_instruction
+                )
+                self.use_system_instruction = True
+                return model
+            except TypeError:
+                # Older SDKs without system instructions get the inline prompt
+                pass
+        self.use_system_instruction = False
+        return genai.GenerativeModel(GEMINI_MODEL)
+    
+    def attach_store(self, store):
+        """Serve precomputed recommendations from a RecommendationStore"""
+        self.store = store
+    
+    def query_collection(self, query, n_results=5, where=None):
+        """Query ChromaDB, coalescing identical concurrent searches, raising on failure"""
+        return _search_flight.do(
+            ("search", self.collection.name, query, n_results, json.dumps(where, sort_keys=True)),
+            lambda: self._query(query, n_results, where)
+        )
+    
+    def _query(self, query, n_results, where):
+        # Multi-vector indexes over-fetch so pooling still yields n_results titles
+        fetch = query_size(n_results, *self.layout)
+        if self.embedding_model is None:
+            results = self.collection.query(query_texts=[query], n_results=fetch, where=where)
+        else:
+            embedding = self.embedding_model.encode([query])
             results = self.collection.query(
-                query_texts=[query],
-                n_results=n_results
+                query_embeddings=[list(map(float, embedding[0]))],
+                n_results=fetch,
+                where=where
             )
+        return max_pool_results(results, n_results)
+    
+    def search_content(self, query, n_results=5, where=None):
+        """Search for content in ChromaDB based on query and optional metadata filter"""
+        try:
+            results = self.query_collection(query, n_results, where)
             return results
         except Exception as e:
-            st.error(f"Error searching content: {str(e)}")
+            self.on_error(f"Error searching content: {str(e)}")
             return None
     
-    def generate_emotion_based_recommendations(self, emotion, n_results=10):
+    def generate_emotion_based_recommendations(self, emotion, n_results=10, where=None):
         """Generate recommendations based on selected emotion"""
         try:
+            # Serve precomputed recommendations when available
+            if self.store is not None and n_results == PRECOMPUTE_N_RESULTS:
+                recommendations = self.store.get(emotion, where)
+                if recommendations:
+                    return recommendations
+            
             # Get emotion-specific query from config
             emotion_query = EMOTION_QUERIES.get(emotion, "general entertainment content")
             
             # Search in ChromaDB
-            results = self.search_content(emotion_query, n_results)
+            results = self.search_content(emotion_query, n_results, where)
             if not results or not results["documents"][0]:
                 return "Sorry, I couldn't find suitable recommendations for your mood."
             
@@ -61,64 +263,159 @@ class RecommendationEngine:
             return recommendations
             
         except Exception as e:
-            st.error(f"Error generating recommendations: {str(e)}")
+            self.on_error(f"Error generating recommendations: {str(e)}")
             return "Sorry, I encountered an error while generating recommendations."
     
+    def compute_recommendations(self, emotion, n_results=10, where=None, priority=PRIORITY_BACKGROUND):
+        """Run retrieval and generation for an emotion, raising on any failure.
+        
+        Used by the background refresher so fallback messages are never stored.
+        Returns None when retrieval finds no matching content.
+        """
+        emotion_query = EMOTION_QUERIES.get(emotion, "general entertainment content")
+        results = self.query_collection(emotion_query, n_results, where)
+        if not results["documents"][0]:
+            return None
+        
+        context = self.build_context(results)
+        return self.complete(self.build_prompt(emotion, emotion_query, context), priority)
+    
+    def get_recommendation_page(self, emotion, session, cursor=None, page_size=PAGE_SIZE):
+        """Generate the next page of recommendations for an emotion within a session.
+        
+        The candidate pool is fetched from ChromaDB once per emotion and kept in
+        the session; later pages are served from memory and skip titles that
+        were already shown. Returns a dict with the recommendations text, the
+        shown titles and the cursor for the following page (None when exhausted).
+        A page only counts as shown once generation succeeds; on failure the
+        cursor is returned unchanged so the same page can be retried.
+        """
+        try:
+            emotion_query = EMOTION_QUERIES.get(emotion, "general entertainment content")
+            
+            candidates = session.candidates.get(emotion)
+            if candidates is None:
+                results = self.search_content(emotion_query, CANDIDATE_POOL_SIZE)
+                if not results or not results["documents"][0]:
+                    return {
+                        "recommendations": "Sorry, I couldn't find suitable recommendations for your mood.",
+                        "titles": [],
+                        "next_cursor": None
+                    }
+                candidates = {
+                    "ids": results["ids"][0],
+                    "documents": results["documents"][0],
+                    "metadatas": results["metadatas"][0]
+                }
+                session.candidates[emotion] = candidates
+                session.cursors[emotion] = 0
+            
+            if cursor is None:
+                cursor = session.cursors.get(emotion, 0)
+            
+            # Collect the next unseen candidates starting at the cursor
+            page = {"ids": [], "documents": [], "metadatas": []}
+            position = cursor
+            total = len(candidates["ids"])
+            while position < total and len(page["ids"]) < page_size:
+                content_id = candidates["ids"][position]
+                if content_id not in session.seen:
+                    page["ids"].append(content_id)
+                    page["documents"].append(candidates["documents"][position])
+                    page["metadatas"].append(candidates["metadatas"][position])
+                position += 1
+            
+            next_cursor = position if position < total else None
+            
+            if not page["ids"]:
+                session.cursors[emotion] = position
+                return {
+                    "recommendations": "You've seen all my picks for this mood! Try another emotion or reset your history.",
+                    "titles": [],
+                    "next_cursor": None
+                }
+            
+            # A fresh first page matches the precomputed top results
+            recommendations = None
+            if (self.store is not None and page_size == PRECOMPUTE_N_RESULTS
+                    and page["ids"] == candidates["ids"][:page_size]):
+                recommendations = self.store.get(emotion)
+            
+            if not recommendations:
+                context = self.build_context({key: [value] for key, value in page.items()})
+                try:
+                    recommendations = self.complete(self.build_prompt(emotion, emotion_query, context))
+                except Exception as e:
+                    # Leave the page unseen so retrying serves the same titles
+                    self.on_error(f"Error with Gemini API: {str(e)}")
+                    return {
+                        "recommendations": f"I understand you're feeling {emotion}, but I'm having trouble accessing my recommendation engine right now. Please try again in a moment!",
+                        "titles": [],
+                        "next_cursor": cursor
+                    }
+            
+            for content_id in page["ids"]:
+                session.seen.add(content_id)
+            titles = [meta.get('title', 'Unknown Title') for meta in page["metadatas"]]
+            session.history.append({"emotion": emotion, "titles": titles})
+            session.cursors[emotion] = position
+            
+            return {
+                "recommendations": recommendations,
+                "titles": titles,
+                "next_cursor": next_cursor
+            }
+            
+        except Exception as e:
+            self.on_error(f"Error generating recommendations: {str(e)}")
+            return {
+                "recommendations": "Sorry, I encountered an error while generating recommendations.",
+                "titles": [],
+                "next_cursor": None
+            }
+    
     def build_context(self, results):
         """Build context string from search results"""
-        context = ""
-        for doc, meta in zip(results["documents"][0], results["metadatas"][0]):
-            title = meta.get('title', 'Unknown Title')
-            category = meta.get('category', 'Unknown Category')
-            genre = meta.get('genre', 'Unknown Genre')
-            year = meta.get('year', 'Unknown Year')
-            rating = meta.get('rating', 'Not Rated')
-            
-            context += f"""
-Title: {title}
-Type: {category}
-Genre: {genre}
-Year: {year}
-Rating: {rating}
-Overview: {doc[:300]}...
-
----
-"""
-        return context
+        return render_context(results)
+    
+    def build_prompt(self, emotion, emotion_query, context):
+        """Build the Gemini prompt for an emotion and retrieved context"""
+        return self.prompt_template.render(
+            emotion,
+            emotion_query,
+            context,
+            inline_instructions=not self.use_system_instruction
+        )
+    
+    def complete(self, prompt, priority=PRIORITY_INTERACTIVE):
+        """Send a prompt to Gemini through the scheduler, raising on failure"""
+        if self.scheduler is None:
+            raise RuntimeError("Gemini is not initialized")
+        
+        # Identical prompts in flight share one Gemini call. Priority is part of
+        # the key so an interactive call never waits behind a queued background one,
+        # and the scheduler so engines with different clients never share results.
+        prompt_key = (
+            "gemini",
+            GEMINI_MODEL,
+            id(self.scheduler),
+            priority,
+            self.prompt_template.fingerprint if self.use_system_instruction else None,
+            hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        )
+        return _gemini_flight.do(
+            prompt_key,
+            lambda: self.scheduler.generate(prompt, priority=priority)
+        )
     
-    def generate_with_gemini(self, emotion, emotion_query, context):
-        """Generate recommendations using Gemini AI"""
+    def generate_with_gemini(self, emotion, emotion_query, context, priority=PRIORITY_INTERACTIVE):
+        """Generate recommendations using Gemini AI through the rate-limited scheduler"""
         try:
-            prompt = f"""
-You are Netflix's premium AI recommendation assistant. A user is feeling {emotion.replace('😊', '').replace('😢', '').replace('😡', '').replace('😴', '').replace('💪', '').replace('😱', '').replace('💔', '').replace('🤔', '').replace('😂', '').replace('😌', '').replace('🔥', '').replace('🧠', '').strip()} and wants content recommendations.
-
-User's Current Mood: {emotion}
-Content Preference: {emotion_query}
-
-Here are the top matching titles from Netflix's catalog:
-{context}
-
-INSTRUCTIONS:
-1. Recommend exactly 5 titles from the provided context
-2. For each recommendation, provide:
-   - Title and type (Movie/TV Show)
-   - Why it matches their current mood
-   - Brief engaging description (2-3 sentences)
-   - What makes it special or unique
-
-3. Format your response in a warm, personalized tone
-4. Start with acknowledging their mood
-5. Use emojis appropriately to match the mood
-6. End with an encouraging note about enjoying their viewing experience
-
-Make the recommendations feel personal and thoughtful, as if coming from a close friend who knows their taste perfectly.
-"""
-
-            response = self.model.generate_content(prompt)
-            return response.text
+            prompt = self.build_prompt(emotion, emotion_query, context)
+            return self.complete(prompt, priority)
             
         except Exception as e:
-            st.error(f"Error with Gemini API: {str(e)}")
+            self.on_error(f"Error with Gemini API: {str(e)}")
             return f"I understand you're feeling {emotion}, but I'm having trouble accessing my recommendation engine right now. Please try again in a moment!"
     
     def get_content_details(self, title_query):
@@ -140,5 +437,5 @@ Make the recommendations feel personal and thoughtful, as if coming from a close
                 return details
             return None
         except Exception as e:
-            st.error(f"Error getting content details: {str(e)}")
+            self.on_error(f"Error getting content details: {str(e)}")
             return None
@@ -0,0 +1,182 @@
+# Precomputed recommendations and background refresh
+"""
+Recommendation store module for Netflix chatbot
+Handles versioned on-disk storage of precomputed emotion recommendations
+and the background refresher that fills it
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from config import *
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compute_store_version(dataset_path=DATASET_PATH, layout=None):
+    """Version precomputed output by catalog contents, models, prompt and index layout"""
+    mode, chunk_words = layout or (INDEX_FIELDS_MODE, CHUNK_MAX_WORDS)
+    parts = [
+        file_checksum(dataset_path) if os.path.exists(dataset_path) else "no-dataset",
+        EMBEDDING_MODEL,
+        GEMINI_MODEL,
+        PROMPT_VERSION,
+        str(PRECOMPUTE_N_RESULTS),
+        mode,
+        str(chunk_words)
+    ]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def variant_key(emotion, where=None):
+    """Key for an emotion and optional metadata filter variant"""
+    return f"{emotion}|{json.dumps(where, sort_keys=True)}"
+
+
+class RecommendationStore:
+    """Versioned JSON store of precomputed recommendations"""
+    def __init__(self, store_dir=PRECOMPUTE_DIR, version=None):
+        self.store_dir = store_dir
+        self.version = version or compute_store_version()
+        self.path = os.path.join(store_dir, f"{self.version}.json")
+        self.lock = threading.Lock()
+        self.entries = self.load()
+
+    def load(self):
+        """Load entries for the current version, ignoring unreadable files"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.version:
+                return data.get("entries", {})
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def get(self, emotion, where=None):
+        """Return stored recommendations text or None on a miss"""
+        entry = self.entries.get(variant_key(emotion, where))
+        return entry["recommendations"] if entry else None
+
+    def has(self, emotion, where=None):
+        return variant_key(emotion, where) in self.entries
+
+    def put(self, emotion, where, recommendations):
+        """Store recommendations and persist the version file atomically"""
+        with self.lock:
+            entries = dict(self.entries)
+            entries[variant_key(emotion, where)] = {
+                "emotion": emotion,
+                "where": where,
+                "recommendations": recommendations,
+                "generated_at": time.time()
+            }
+            self._write(entries)
+            self.entries = entries
+
+    def _write(self, entries):
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "entries": entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def prune(self):
+        """Remove store files from older versions"""
+        if not os.path.isdir(self.store_dir):
+            return
+        for name in os.listdir(self.store_dir):
+            if name.endswith(".json") and name != os.path.basename(self.path):
+                os.remove(os.path.join(self.store_dir, name))
+
+
+class RecommendationRefresher:
+    """Background thread that precomputes recommendations for every emotion"""
+    def __init__(self, engine, store, variants=None, interval=PRECOMPUTE_REFRESH_INTERVAL):
+        self.engine = engine
+        self.store = store
+        self.variants = variants if variants is not None else PRECOMPUTE_VARIANTS
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.stats = {"refreshed": 0, "failed": 0, "last_run": None}
+
+    def refresh(self, force=False):
+        """Generate missing (or all, when forced) emotion and variant entries"""
+        for emotion in EMOTION_QUERIES:
+            for where in self.variants:
+                if self.stop_event.is_set():
+                    return
+                if not force and self.store.has(emotion, where):
+                    continue
+                try:
+                    recommendations = self.engine.compute_recommendations(
+                        emotion, PRECOMPUTE_N_RESULTS, where
+                    )
+                    if recommendations:
+                        self.store.put(emotion, where, recommendations)
+                        self.stats["refreshed"] += 1
+                except Exception:
+                    # Misses fall back to live generation, so keep going
+                    self.stats["failed"] += 1
+        self.stats["last_run"] = time.time()
+
+    def _run(self):
+        force = False
+        while not self.stop_event.is_set():
+            self.refresh(force=force)
+            force = True
+            if self.stop_event.wait(self.interval):
+                break
+
+    def start(self):
+        """Start refreshing now and then on the configured schedule"""
+        if self.thread is None or not self.thread.is_alive():
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._run, name="recommendation-refresher", daemon=True)
+            self.thread.start()
+
+    def stop(self, timeout=None):
+        """Stop after the current entry; with a timeout, wait up to that long for it.
+
+        Returns True once the thread has finished.
+        """
+        self.stop_event.set()
+        if timeout is not None and self.thread is not None:
+            self.thread.join(timeout)
+        return self.thread is None or not self.thread.is_alive()
+
+
+# One store and refresher per process, shared by all sessions
+_store = None
+_refresher = None
+_lock = threading.Lock()
+
+
+def get_recommendation_store(layout=None):
+    """Return the process-wide store for the current catalog version and index layout"""
+    global _store
+    with _lock:
+        if _store is None:
+            _store = RecommendationStore(version=compute_store_version(layout=layout))
+            _store.prune()
+        return _store
+
+
+def start_background_refresh(engine):
+    """Start the process-wide refresher once, using the given engine"""
+    global _refresher
+    store = get_recommendation_store(engine.layout)
+    with _lock:
+        if _refresher is None:
+            _refresher = RecommendationRefresher(engine, store)
+            _refresher.start()
+        return _refresher
@@ -0,0 +1,103 @@
+import chromadb
+import pytest
+from fastapi.testclient import TestClient
+import api
+from llm_scheduler import LLMScheduler
+from recommendation_engine import RecommendationEngine
+
+
+class FakeClient:
+    def generate_content(self, prompt, request_options=None):
+        raise AssertionError("the API tests never generate")
+
+
+CATALOG = [
+    (550, "Fight Club", [1.0, 0.0, 0.0]),
+    (603, "The Matrix", [0.9, 0.1, 0.0]),
+    (680, "Pulp Fiction", [0.0, 1.0, 0.0]),
+]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    collection = chromadb.EphemeralClient().get_or_create_collection(f"api_test_{id(monkeypatch)}")
+    collection.add(
+        ids=[str(row) for row in range(len(CATALOG))],
+        embeddings=[embedding for _, _, embedding in CATALOG],
+        documents=[f"{title} overview " * 40 for _, title, _ in CATALOG],
+        metadatas=[{"id": catalog_id, "title": title} for catalog_id, title, _ in CATALOG]
+    )
+    fake = FakeClient()
+    engine = RecommendationEngine(collection, model=fake, scheduler=LLMScheduler(fake, workers=1))
+    monkeypatch.setattr(api, "_engine", engine)
+    return TestClient(api.app)
+
+
+def test_title_is_looked_up_by_catalog_id(client):
+    response = client.get("/title/603")
+    assert response.status_code == 200
+    item = response.json()
+    assert item["id"] == 603
+    assert item["doc_id"] == "1"
+    assert item["title"] == "The Matrix"
+    assert client.get("/title/1").status_code == 404
+
+
+def test_similar_excludes_the_title_itself(client):
+    response = client.get("/similar/550?n_results=2")
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [item["id"] for item in results] == [603, 680]
+
+
+def test_etag_is_weak_and_answers_if_none_match_with_304(client):
+    response = client.get("/title/550")
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+
+    cached = client.get("/title/550", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.content == b""
+
+    # Caches may send the validator without the weak prefix or in a list
+    assert client.get("/title/550", headers={"If-None-Match": '"other", ' + etag[2:]}).status_code == 304
+    assert client.get("/title/550", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_large_responses_are_gzipped_with_the_same_etag(client):
+    identity = client.get("/title/550", headers={"Accept-Encoding": "identity"})
+    compressed = client.get("/title/550", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in identity.headers
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.json() == identity.json()
+    assert compressed.headers["etag"] == identity.headers["etag"]
+
+
+def test_similar_uses_overview_vectors_in_separate_layout(monkeypatch):
+    collection = chromadb.EphemeralClient().get_or_create_collection(f"api_separate_{id(monkeypatch)}")
+    collection.modify(metadata={"index_fields_mode": "separate", "chunk_max_words": 0})
+    rows = [
+        # Title vectors point one way, overviews another
+        ("0:title:0", 550, "title", [0.0, 0.0, 1.0]),
+        ("0:overview:1", 550, "overview", [1.0, 0.0, 0.0]),
+        ("1:title:0", 603, "title", [0.0, 0.1, 0.9]),
+        ("1:overview:1", 603, "overview", [0.0, 1.0, 0.0]),
+        ("2:title:0", 680, "title", [0.0, 0.9, 0.1]),
+        ("2:overview:1", 680, "overview", [0.9, 0.1, 0.0]),
+    ]
+    collection.add(
+        ids=[vector_id for vector_id, _, _, _ in rows],
+        embeddings=[embedding for _, _, _, embedding in rows],
+        documents=["overview"] * len(rows),
+        metadatas=[
+            {"id": catalog_id, "doc_id": vector_id.split(":")[0], "field": field}
+            for vector_id, catalog_id, field, _ in rows
+        ]
+    )
+    fake = FakeClient()
+    engine = RecommendationEngine(collection, model=fake, scheduler=LLMScheduler(fake, workers=1))
+    monkeypatch.setattr(api, "_engine", engine)
+
+    results = TestClient(api.app).get("/similar/550?n_results=1").json()["results"]
+    assert [item["id"] for item in results] == [680]
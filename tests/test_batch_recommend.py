@@ -0,0 +1,117 @@
+import json
+import numpy as np
+from batch_recommend import BatchRecommender, truncate_partial_line
+from llm_scheduler import LLMScheduler
+from recommendation_engine import RecommendationEngine
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeClient:
+    """Fails prompts mentioning any of the failing words"""
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+
+    def generate_content(self, prompt, request_options=None):
+        if any(word in prompt for word in self.failing):
+            raise ValueError("upstream unavailable")
+        return FakeResponse("recommendations")
+
+
+class FakeCollection:
+    name = "fake"
+    metadata = None
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=5, where=None):
+        count = len(query_embeddings)
+        return {
+            "ids": [[str(i) for i in range(n_results)] for _ in range(count)],
+            "documents": [[f"overview {i}" for i in range(n_results)] for _ in range(count)],
+            "metadatas": [[{"title": f"Title {i}"} for i in range(n_results)] for _ in range(count)],
+            "distances": [[i / 100 for i in range(n_results)] for _ in range(count)]
+        }
+
+
+class FakeEmbedder:
+    def encode(self, texts, batch_size=None):
+        return np.array([[float(len(text)), 1.0] for text in texts])
+
+
+def make_recommender(client):
+    scheduler = LLMScheduler(client, requests_per_minute=6000, max_retries=0, workers=2)
+    engine = RecommendationEngine(FakeCollection(), model=client, scheduler=scheduler)
+    return BatchRecommender(engine, FakeEmbedder(), n_results=3, batch_size=2, concurrency=2)
+
+
+def write_lines(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records), encoding="utf-8")
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_rerun_replaces_error_rows_and_keeps_input_text(tmp_path):
+    input_path = tmp_path / "moods.jsonl"
+    output_path = tmp_path / "out.jsonl"
+    write_lines(input_path, [
+        {"id": 1, "query": "  Cozy   RAINY day "},
+        {"id": 2, "query": "something scary"}
+    ])
+
+    make_recommender(FakeClient(failing={"scary"})).run(str(input_path), str(output_path))
+    records = read_records(output_path)
+    assert [record["id"] for record in records] == ["1", "2"]
+    assert records[0]["query"] == "  Cozy   RAINY day "
+    assert "error" in records[1]
+
+    make_recommender(FakeClient()).run(str(input_path), str(output_path))
+    records = read_records(output_path)
+    assert [record["id"] for record in records] == ["1", "2"]
+    assert not any("error" in record for record in records)
+
+
+def test_truncate_partial_line_drops_an_unfinished_record(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_bytes(b'{"id": "1"}\n{"id": "2", "ti')
+    truncate_partial_line(str(path))
+    assert path.read_bytes() == b'{"id": "1"}\n'
+
+    # A complete file is left alone
+    truncate_partial_line(str(path))
+    assert path.read_bytes() == b'{"id": "1"}\n'
+
+
+def test_truncate_partial_line_empties_a_file_without_newlines(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_bytes(b'{"id": "1", "ti')
+    truncate_partial_line(str(path))
+    assert path.read_bytes() == b""
+
+
+def test_truncate_partial_line_scans_back_past_64_kib(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_bytes(b'{"id": "1"}\n' + b'{"id": "2", "recommendations": "' + b"x" * 200000)
+    truncate_partial_line(str(path))
+    assert path.read_bytes() == b'{"id": "1"}\n'
+
+
+def test_resume_after_interruption_skips_done_ids(tmp_path):
+    input_path = tmp_path / "moods.jsonl"
+    output_path = tmp_path / "out.jsonl"
+    write_lines(input_path, [{"id": i, "query": f"mood {i}"} for i in range(1, 5)])
+    output_path.write_text(
+        json.dumps({"id": "1", "query": "mood 1", "titles": [], "recommendations": "done"}) + "\n"
+        + '{"id": "2", "query": "mo',
+        encoding="utf-8"
+    )
+
+    recommender = make_recommender(FakeClient())
+    stats = recommender.run(str(input_path), str(output_path))
+    records = read_records(output_path)
+    assert [record["id"] for record in records] == ["1", "2", "3", "4"]
+    assert records[0]["recommendations"] == "done"
+    assert stats["records"] == 3
@@ -0,0 +1,17 @@
+import os
+import pytest
+from config import ONNX_MODEL_DIR, ONNX_MODEL_FILE, PARITY_MIN_COSINE
+
+
+def test_onnx_embeddings_match_pytorch():
+    """The int8 ONNX encoder must stay within the parity threshold of PyTorch"""
+    pytest.importorskip("sentence_transformers")
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("tokenizers")
+    if not os.path.exists(os.path.join(ONNX_MODEL_DIR, ONNX_MODEL_FILE)):
+        pytest.skip("ONNX model not exported; run python embedding_runtime.py export")
+
+    from embedding_runtime import check_parity
+
+    report = check_parity()
+    assert report["min_cosine"] >= PARITY_MIN_COSINE, report
@@ -0,0 +1,100 @@
+import json
+import math
+import os
+import numpy as np
+import pytest
+from config import EMBEDDING_DIMENSION
+from index_snapshot import SnapshotError, decode_metadata, encode_metadata, export_snapshot, load_snapshot, restore_snapshot
+
+
+METADATAS = [
+    {"title": "Alpha", "year": 2001, "rating": 7, "adult": False},
+    {"title": float("nan"), "year": 2002, "rating": 8.5, "adult": True},
+    {"title": "Gamma", "rating": float("nan")},
+]
+
+
+class FakeCollection:
+    """Minimal in-memory stand-in for a ChromaDB collection"""
+    name = "fake"
+
+    def __init__(self, count=0):
+        self.metadata = None
+        self.ids = [str(i) for i in range(count)]
+        self.documents = [f"overview {i}" for i in range(count)]
+        self.metadatas = METADATAS[:count]
+        self.embeddings = np.random.default_rng(0).random((count, EMBEDDING_DIMENSION)).tolist()
+
+    def count(self):
+        return len(self.ids)
+
+    def get(self, limit, offset, include):
+        end = offset + limit
+        return {
+            "ids": self.ids[offset:end],
+            "documents": self.documents[offset:end],
+            "metadatas": self.metadatas[offset:end],
+            "embeddings": self.embeddings[offset:end]
+        }
+
+    def add(self, ids, documents, embeddings, metadatas):
+        self.ids.extend(ids)
+        self.documents.extend(documents)
+        self.embeddings.extend(embeddings)
+        self.metadatas.extend(metadatas)
+
+    def modify(self, metadata):
+        self.metadata = metadata
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "catalog.csv"
+    path.write_text("id,title\n1,Alpha\n", encoding="utf-8")
+    return str(path)
+
+
+def test_metadata_round_trip_keeps_types_and_missing_values():
+    columns = encode_metadata(METADATAS)
+    assert columns["title"] == {"type": "str", "values": ["Alpha", None, "Gamma"]}
+    assert columns["year"] == {"type": "int", "values": [2001, 2002, None]}
+    assert columns["rating"] == {"type": "float", "values": [7.0, 8.5, None]}
+    assert columns["adult"] == {"type": "bool", "values": [False, True, None]}
+
+    decoded = decode_metadata(json.loads(json.dumps(columns)), len(METADATAS))
+    assert decoded == [
+        {"title": "Alpha", "year": 2001, "rating": 7.0, "adult": False},
+        {"year": 2002, "rating": 8.5, "adult": True},
+        {"title": "Gamma"},
+    ]
+    assert isinstance(decoded[0]["rating"], float)
+    assert not any(isinstance(value, float) and math.isnan(value) for item in decoded for value in item.values())
+
+
+def test_snapshot_restores_into_an_empty_collection(tmp_path, dataset):
+    source = FakeCollection(count=3)
+    snapshot_dir = export_snapshot(source, str(tmp_path / "snapshots"), dataset_path=dataset, page_size=2)
+
+    target = FakeCollection()
+    manifest = restore_snapshot(snapshot_dir, target, batch_size=2, dataset_path=dataset)
+    assert manifest["count"] == 3
+    assert target.ids == source.ids
+    assert target.metadatas[1] == {"year": 2002, "rating": 8.5, "adult": True}
+    assert np.allclose(target.embeddings, source.embeddings, atol=1e-3)
+    assert target.metadata["index_fields_mode"] == manifest["index_fields_mode"]
+
+
+def test_corrupt_snapshot_is_refused(tmp_path, dataset):
+    snapshot_dir = export_snapshot(FakeCollection(count=3), str(tmp_path / "snapshots"), dataset_path=dataset)
+    with open(os.path.join(snapshot_dir, "records.json"), "a", encoding="utf-8") as f:
+        f.write(" ")
+    with pytest.raises(SnapshotError, match="Checksum mismatch"):
+        load_snapshot(snapshot_dir, dataset_path=dataset)
+
+
+def test_snapshot_of_another_dataset_is_refused(tmp_path, dataset):
+    snapshot_dir = export_snapshot(FakeCollection(count=3), str(tmp_path / "snapshots"), dataset_path=dataset)
+    with open(dataset, "a", encoding="utf-8") as f:
+        f.write("2,Beta\n")
+    with pytest.raises(SnapshotError, match="different dataset"):
+        load_snapshot(snapshot_dir, dataset_path=dataset)
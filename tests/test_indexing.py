@@ -0,0 +1,87 @@
+import pandas as pd
+from config import QUERY_OVERFETCH
+from indexing import build_index_entries, chunk_text, max_pool_results, query_size
+
+
+WORDS = " ".join(f"w{i}" for i in range(20))
+
+
+def test_chunk_text_keeps_short_text_whole():
+    assert chunk_text("a b c", max_words=5, overlap=2) == ["a b c"]
+    assert chunk_text(WORDS, max_words=0) == [WORDS]
+
+
+def test_chunk_text_windows_overlap_and_reach_the_tail():
+    chunks = chunk_text(WORDS, max_words=8, overlap=3)
+    assert chunks[0].split() == [f"w{i}" for i in range(8)]
+    assert chunks[1].split()[0] == "w5"
+    assert chunks[-1].split()[-1] == "w19"
+
+
+def test_chunk_text_clamps_overlap_of_a_whole_window():
+    for overlap in (5, 6, 50):
+        chunks = chunk_text(WORDS, max_words=5, overlap=overlap)
+        assert chunks[-1].split()[-1] == "w19"
+        assert all(len(chunk.split()) <= 5 for chunk in chunks)
+
+
+def results(rows):
+    """Single-query ChromaDB result from (vector_id, doc_id, distance) rows"""
+    return {
+        "ids": [[vector_id for vector_id, _, _ in rows]],
+        "documents": [[f"doc {doc_id}" for _, doc_id, _ in rows]],
+        "metadatas": [[{"doc_id": doc_id} for _, doc_id, _ in rows]],
+        "distances": [[distance for _, _, distance in rows]]
+    }
+
+
+def test_max_pool_keeps_each_title_once_at_its_best_score():
+    pooled = max_pool_results(results([
+        ("1:title:0", "1", 0.1),
+        ("2:overview:1", "2", 0.2),
+        ("1:overview:1", "1", 0.3),
+        ("3:title:0", "3", 0.4),
+        ("2:title:0", "2", 0.5),
+    ]), n_results=10)
+    assert pooled["ids"] == [["1", "2", "3"]]
+    assert pooled["distances"] == [[0.1, 0.2, 0.4]]
+    assert pooled["documents"] == [["doc 1", "doc 2", "doc 3"]]
+
+
+def test_max_pool_stops_at_n_results_and_reads_the_given_query():
+    batch = results([("a", "1", 0.1), ("b", "2", 0.2)])
+    second = results([("c", "3", 0.1), ("d", "3", 0.2), ("e", "4", 0.3), ("f", "5", 0.4)])
+    for key in batch:
+        batch[key].extend(second[key])
+    pooled = max_pool_results(batch, n_results=2, query_index=1)
+    assert pooled["ids"] == [["3", "4"]]
+
+
+def test_max_pool_uses_vector_ids_for_single_vector_layouts():
+    raw = {"ids": [["7", "8"]], "documents": [["a", "b"]], "metadatas": [[{}, None]]}
+    pooled = max_pool_results(raw, n_results=5)
+    assert pooled["ids"] == [["7", "8"]]
+    assert pooled["distances"] == [[None, None]]
+
+
+def test_query_size_over_fetches_only_for_multi_vector_layouts():
+    assert query_size(10, "overview", 0) == 10
+    assert query_size(10, "template", 0) == 10
+    assert query_size(10, "separate", 0) == 10 * QUERY_OVERFETCH
+    assert query_size(10, "overview", 64) == 10 * QUERY_OVERFETCH
+
+
+def test_build_index_entries_tags_multi_vector_rows():
+    batch = pd.DataFrame(
+        {"title": ["Alpha", "Beta"], "overview": ["first overview", "second overview"]},
+        index=[4, 9]
+    )
+    ids, texts, documents, metadatas = build_index_entries(batch, mode="separate", chunk_words=0)
+    assert ids == ["4:title:0", "4:overview:1", "9:title:0", "9:overview:1"]
+    assert texts == ["Alpha", "first overview", "Beta", "second overview"]
+    assert documents == ["first overview", "first overview", "second overview", "second overview"]
+    assert [metadata["doc_id"] for metadata in metadatas] == ["4", "4", "9", "9"]
+
+    ids, _, _, metadatas = build_index_entries(batch, mode="overview", chunk_words=0)
+    assert ids == ["4", "9"]
+    assert "doc_id" not in metadatas[0]
@@ -0,0 +1,105 @@
+import threading
+import time
+import pytest
+from llm_scheduler import DeadlineExceededError, LLMScheduler, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeRateLimitError(Exception):
+    code = 429
+
+
+class FakeClient:
+    """Records prompts in call order and fails the first few calls with a 429"""
+    def __init__(self, latency=0.0, failures=0):
+        self.latency = latency
+        self.failures = failures
+        self.lock = threading.Lock()
+        self.prompts = []
+
+    def generate_content(self, prompt, request_options=None):
+        with self.lock:
+            self.prompts.append(prompt)
+            fail = self.failures > 0
+            self.failures -= 1
+        time.sleep(self.latency)
+        if fail:
+            raise FakeRateLimitError("429 Resource has been exhausted")
+        return FakeResponse(f"response to {prompt}")
+
+
+def make_scheduler(client, **kwargs):
+    options = {
+        "requests_per_minute": 6000,
+        "tokens_per_minute": 10 ** 9,
+        "max_retries": 3,
+        "base_delay": 0.01,
+        "max_delay": 0.05,
+        "timeout": 5,
+        "background_timeout": 5,
+        "workers": 2
+    }
+    options.update(kwargs)
+    return LLMScheduler(client, **options)
+
+
+def test_generate_returns_response_text():
+    scheduler = make_scheduler(FakeClient())
+    assert scheduler.generate("hello") == "response to hello"
+    assert scheduler.get_stats()["completed"] == 1
+
+
+def test_retries_rate_limited_calls():
+    client = FakeClient(failures=2)
+    scheduler = make_scheduler(client)
+    assert scheduler.generate("hello") == "response to hello"
+    assert len(client.prompts) == 3
+    assert scheduler.get_stats()["retries"] == 2
+
+
+def test_gives_up_after_max_retries():
+    client = FakeClient(failures=10)
+    scheduler = make_scheduler(client, max_retries=2)
+    with pytest.raises(FakeRateLimitError):
+        scheduler.generate("hello")
+    assert len(client.prompts) == 3
+    assert scheduler.get_stats()["failed"] == 1
+
+
+def test_fails_when_quota_wait_exceeds_deadline():
+    client = FakeClient()
+    # One request per minute: the second call would wait about a minute for quota
+    scheduler = make_scheduler(client, requests_per_minute=1)
+    assert scheduler.generate("first") == "response to first"
+    with pytest.raises(DeadlineExceededError):
+        scheduler.generate("second", timeout=0.5)
+    assert client.prompts == ["first"]
+    assert scheduler.get_stats()["deadline_exceeded"] == 1
+
+
+def test_fails_when_retry_backoff_exceeds_deadline():
+    client = FakeClient(failures=10)
+    scheduler = make_scheduler(client, base_delay=10, max_delay=10, max_retries=5)
+    # Full jitter may pick a short delay, so allow a few quick retries first
+    with pytest.raises(DeadlineExceededError):
+        scheduler.generate("hello", timeout=0.2)
+
+
+def test_interactive_call_overtakes_queued_background_jobs():
+    client = FakeClient(latency=0.05)
+    # Quota for one call per second keeps the background jobs queued
+    scheduler = make_scheduler(client, requests_per_minute=60, workers=2)
+    scheduler.request_bucket.tokens = 1.0
+    background = [scheduler.submit(f"background {i}", PRIORITY_BACKGROUND) for i in range(6)]
+    time.sleep(0.2)
+
+    start = time.monotonic()
+    assert scheduler.generate("interactive", PRIORITY_INTERACTIVE) == "response to interactive"
+    # Runs on the next token rather than after every queued background job
+    assert time.monotonic() - start < 1.5
+    assert client.prompts[:2] == ["background 0", "interactive"]
+    assert not all(future.done() for future in background)
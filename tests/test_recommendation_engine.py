@@ -0,0 +1,81 @@
+from config import EMOTION_QUERIES
+from llm_scheduler import LLMScheduler
+from recommendation_engine import RecommendationEngine, RecommendationSession
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeClient:
+    """Fails every call while failing is set, otherwise echoes the prompt size"""
+    def __init__(self, failing=True):
+        self.failing = failing
+        self.calls = 0
+
+    def generate_content(self, prompt, request_options=None):
+        self.calls += 1
+        if self.failing:
+            raise ValueError("upstream unavailable")
+        return FakeResponse(f"recommendations for {len(prompt)} characters")
+
+
+class FakeCollection:
+    name = "fake"
+    metadata = None
+
+    def __init__(self, size=25):
+        self.size = size
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=5, where=None):
+        count = min(n_results, self.size)
+        return {
+            "ids": [[str(i) for i in range(count)]],
+            "documents": [[f"overview {i}" for i in range(count)]],
+            "metadatas": [[{"title": f"Title {i}"} for i in range(count)]],
+            "distances": [[i / 100 for i in range(count)]]
+        }
+
+
+def make_engine(client, errors):
+    scheduler = LLMScheduler(client, requests_per_minute=6000, max_retries=0, workers=1)
+    return RecommendationEngine(FakeCollection(), on_error=errors.append, model=client, scheduler=scheduler)
+
+
+def test_failed_generation_leaves_page_unseen():
+    client = FakeClient(failing=True)
+    errors = []
+    engine = make_engine(client, errors)
+    session = RecommendationSession()
+    emotion = next(iter(EMOTION_QUERIES))
+
+    result = engine.get_recommendation_page(emotion, session, page_size=10)
+    assert result["titles"] == []
+    assert result["next_cursor"] == 0
+    assert len(session.seen) == 0
+    assert session.history == []
+    assert session.cursors[emotion] == 0
+    assert errors
+
+    # Retrying once the model recovers serves the same first page
+    client.failing = False
+    result = engine.get_recommendation_page(emotion, session, cursor=result["next_cursor"], page_size=10)
+    assert result["titles"] == [f"Title {i}" for i in range(10)]
+    assert result["next_cursor"] == 10
+    assert len(session.seen) == 10
+    assert session.cursors[emotion] == 10
+
+
+def test_process_scheduler_splits_quota_only_when_asked(monkeypatch):
+    import recommendation_engine
+    from config import GEMINI_REQUESTS_PER_MINUTE
+
+    client = FakeClient(failing=False)
+    monkeypatch.setattr(recommendation_engine, "_scheduler", None)
+    full = recommendation_engine.get_scheduler(client)
+    assert full.request_bucket.rate == GEMINI_REQUESTS_PER_MINUTE / 60
+
+    monkeypatch.setattr(recommendation_engine, "_scheduler", None)
+    shared = recommendation_engine.get_scheduler(client, processes=3)
+    assert shared.request_bucket.rate == GEMINI_REQUESTS_PER_MINUTE / 3 / 60